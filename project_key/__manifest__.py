@@ -10,6 +10,10 @@
     "author": "Modoolar, Odoo Community Association (OCA)",
     "website": "https://github.com/OCA/project/",
     "depends": ["project"],
-    "data": ["views/project_key_views.xml"],
+    "data": [
+        "security/ir.model.access.csv",
+        "data/ir_cron.xml",
+        "views/project_key_views.xml",
+    ],
     "post_init_hook": "post_init_hook",
 }
@@ -1,36 +1,47 @@
 # Copyright 2017 - 2018 Modoolar <info@modoolar.com>
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
+import hashlib
+import json
+import re
+
 import werkzeug
 
 from odoo import http
 
 # from odoo.http import request
 
+KEY_SEPARATOR = re.compile(r"[\s,]+")
+
 
 class ProjectBrowser(http.Controller):
     def get_record_url(self, model, domain, action_xml_id):
         env = http.request.env()
 
         records = env[model].search(domain)
-        record_id = records and records.id or -1
+        return self.format_record_url(records, action_xml_id)
+
+    def format_record_url(self, record, action_xml_id):
+        env = http.request.env()
+
+        record_id = record and record.id or -1
         action_id = env.ref(action_xml_id).id
 
         return "/web#id={}&view_type=form&model={}&action={}".format(
-            record_id, model, action_id
+            record_id, record._name, action_id
         )
 
     def get_task_url(self, key):
-        return self.get_record_url(
-            "project.task", [("key", "=ilike", key)], "project.action_view_task"
-        )
+        env = http.request.env()
+
+        task = env["project.task"].get_task_by_key(key)
+        return self.format_record_url(task, "project.action_view_task")
 
     def get_project_url(self, key):
-        return self.get_record_url(
-            "project.project",
-            [("key", "=ilike", key)],
-            "project.open_view_project_all_config",
-        )
+        env = http.request.env()
+
+        project = env["project.project"].get_project_by_key(key)
+        return self.format_record_url(project, "project.open_view_project_all_config")
 
     @http.route(["/projects/<string:key>"], type="http", auth="user")
     def open_project(self, key, **kwargs):
@@ -39,3 +50,24 @@ class ProjectBrowser(http.Controller):
     @http.route(["/tasks/<string:key>"], type="http", auth="user")
     def open_task(self, key, **kwargs):
         return werkzeug.utils.redirect(self.get_task_url(key), 301)
+
+    @http.route(["/tasks/resolve"], type="http", auth="user", methods=["GET"])
+    def resolve_tasks(self, keys="", **kwargs):
+        env = http.request.env()
+
+        Task = env["project.task"]
+        keys = [key for key in KEY_SEPARATOR.split(keys) if key]
+        task_ids = Task._resolve_task_key_ids(keys)
+        # The validator is computed before reading the tasks, so that repeat
+        # lookups stop here
+        version = Task._get_resolved_tasks_version(list(task_ids.values()))
+        validator = json.dumps([env.uid, keys, sorted(task_ids.items()), version])
+        etag = '"{}"'.format(hashlib.sha1(validator.encode()).hexdigest())
+        headers = [("ETag", etag), ("Cache-Control", "private, no-cache")]
+
+        if http.request.httprequest.headers.get("If-None-Match") == etag:
+            return werkzeug.wrappers.Response(status=304, headers=headers)
+        body = json.dumps(Task._read_resolved_tasks(keys, task_ids), sort_keys=True)
+        return werkzeug.wrappers.Response(
+            body, headers=headers, content_type="application/json"
+        )
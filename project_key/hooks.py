@@ -4,6 +4,9 @@
 
 def post_init_hook(cr, registry):
     from odoo import api, SUPERUSER_ID
+    from odoo.tools import config
+    from .models.project_project import BACKFILL_CHUNK_SIZE
 
     env = api.Environment(cr, SUPERUSER_ID, {})
-    env["project.project"]._set_default_project_key()
+    chunk_size = int(config.get("project_key_chunk_size", BACKFILL_CHUNK_SIZE))
+    env["project.project"]._set_default_project_key(chunk_size=chunk_size, commit=True)
@@ -1,4 +1,7 @@
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
+from . import ir_sequence
+from . import project_key_lookup
 from . import project_project
 from . import project_task
+from . import project_task_key_alias
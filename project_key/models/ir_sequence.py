@@ -0,0 +1,42 @@
+# License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
+
+from odoo import models
+
+
+class IrSequence(models.Model):
+    _inherit = "ir.sequence"
+
+    def _next_batch(self, count):
+        """
+        This method draws ``count`` values of the current sequence in a
+        single statement, unless it uses date ranges.
+        :param count: Number of values to draw
+        :return: Returns list of values in sequence order
+        """
+        self.ensure_one()
+        if not count:
+            return []
+        if self.use_date_range:
+            return [self._next() for _i in range(count)]
+        cr = self.env.cr
+        if self.implementation == "standard":
+            cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ("ir_sequence_%03d" % self.id, count),
+            )
+            numbers = sorted(row[0] for row in cr.fetchall())
+        else:
+            increment = self.number_increment
+            cr.execute(
+                """
+                UPDATE ir_sequence
+                SET number_next = number_next + %s
+                WHERE id = %s
+                RETURNING number_next
+                """,
+                (increment * count, self.id),
+            )
+            number_last = cr.fetchone()[0]
+            self.invalidate_cache(["number_next"], self.ids)
+            numbers = range(number_last - increment * count, number_last, increment)
+        return [self.get_next_char(number) for number in numbers]
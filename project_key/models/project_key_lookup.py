@@ -0,0 +1,148 @@
+# License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, models
+from odoo.tools.lru import LRU
+
+CACHE_SIZE = 8192
+GENERATION_KEY = "project_key_lookup_generation"
+INVALIDATED_KEY = "project_key_lookup_invalidated"
+
+
+class KeyLookupCache(object):
+    def __init__(self):
+        self.lru = LRU(CACHE_SIZE)
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+
+# Key lookup caches of this process, by database
+_caches = {}
+
+
+class ProjectKeyLookup(models.AbstractModel):
+    _name = "project.key.lookup"
+    _description = "Project and Task Key Lookups"
+
+    def init(self):
+        # One row is inserted after each committed transaction rewriting
+        # keys. Inserts take no lock on shared rows, ids never repeat, and
+        # the greatest id visible to a transaction is consistent with the
+        # keys it reads.
+        self.env.cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS project_key_lookup_invalidation (
+                id SERIAL PRIMARY KEY
+            )
+            """
+        )
+
+    @api.model
+    def _get_id(self, model_name, key, lookup):
+        """
+        This method returns the id of the record of the given model having
+        the given lower case key, from the cache of this process.
+        :param lookup: Function returning the id of the record having the
+        given key, or False; unknown keys are not kept in the cache
+        :return: Returns record id or False
+        """
+        cache = self._get_cache()
+        if cache is None:
+            return lookup(key)
+        try:
+            record_id = cache.lru[(model_name, key)]
+            cache.hits += 1
+            return record_id
+        except KeyError:
+            cache.misses += 1
+        record_id = lookup(key)
+        if record_id:
+            cache.lru[(model_name, key)] = record_id
+        return record_id
+
+    @api.model
+    def _get_cache(self):
+        """
+        This method returns the cache of this process, or None when the
+        current transaction may not use it: it rewrote keys itself, or it
+        does not see invalidations other transactions of this process saw.
+        """
+        cr = self.env.cr
+        if cr.cache.get(INVALIDATED_KEY):
+            return None
+        generation = cr.cache.get(GENERATION_KEY)
+        if generation is None:
+            cr.execute(
+                "SELECT COALESCE(max(id), 0) FROM project_key_lookup_invalidation"
+            )
+            generation = cr.fetchone()[0]
+            self._set_transaction_value(GENERATION_KEY, generation)
+        cache = _caches.get(cr.dbname)
+        if cache is None:
+            cache = _caches[cr.dbname] = KeyLookupCache()
+        if cache.generation is None or cache.generation < generation:
+            cache.lru.clear()
+            cache.generation = generation
+        elif cache.generation > generation:
+            return None
+        return cache
+
+    @api.model
+    def _set_transaction_value(self, key, value):
+        # Kept until the end of the current transaction
+        cr = self.env.cr
+        cr.cache[key] = value
+
+        def forget():
+            cr.cache.pop(key, None)
+
+        cr.after("commit", forget)
+        cr.after("rollback", forget)
+
+    @api.model
+    def invalidate(self):
+        """
+        This method drops the cached key lookups of all processes, once the
+        current transaction is committed. Until then, the current
+        transaction does not use the cache. Call it whenever keys are
+        rewritten.
+        """
+        cr = self.env.cr
+        if cr.cache.get(INVALIDATED_KEY):
+            return
+        self._set_transaction_value(INVALIDATED_KEY, True)
+        registry = self.pool
+
+        def notify():
+            with registry.cursor() as notify_cr:
+                notify_cr.execute(
+                    """
+                    INSERT INTO project_key_lookup_invalidation DEFAULT VALUES
+                    RETURNING id
+                    """
+                )
+                last_id = notify_cr.fetchone()[0]
+                notify_cr.commit()
+                # Older rows are only needed by running transactions, which
+                # still see them; another process may be deleting them too
+                try:
+                    notify_cr.execute(
+                        "DELETE FROM project_key_lookup_invalidation WHERE id < %s",
+                        (last_id,),
+                        log_exceptions=False,
+                    )
+                except TransactionRollbackError:
+                    notify_cr.rollback()
+
+        cr.after("commit", notify)
+
+    @api.model
+    def get_stats(self):
+        """
+        This method returns the hit and miss counters of the key lookup
+        cache of this process.
+        """
+        cache = _caches.get(self.env.cr.dbname) or KeyLookupCache()
+        return {"hits": cache.hits, "misses": cache.misses, "size": len(cache.lru)}
@@ -1,9 +1,19 @@
 # Copyright 2017 - 2018 Modoolar <info@modoolar.com>
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
-from odoo import _, api, fields, models
+import logging
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import _, api, fields, models, tools
 from odoo.osv import expression
 from odoo.tools import config
+from odoo.tools.misc import escape_psql
+
+_logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 10000
+REKEY_CHUNK_SIZE = 5000
 
 
 class Project(models.Model):
@@ -15,10 +25,27 @@ class Project(models.Model):
 
     key = fields.Char(string="Key", size=10, required=False, index=True, copy=False)
 
+    task_key_update_pending = fields.Boolean(
+        string="Task Keys Update Pending",
+        copy=False,
+        readonly=True,
+        help="Task keys of this project are being updated in the background.",
+    )
+
+    task_key_update_last_id = fields.Integer(
+        string="Last Updated Task", copy=False, readonly=True
+    )
+
     _sql_constraints = [
         ("project_key_unique", "UNIQUE(key)", "Project key must be unique")
     ]
 
+    def init(self):
+        super(Project, self).init()
+        tools.create_index(
+            self._cr, "project_project_key_lower_index", self._table, ["lower(key)"]
+        )
+
     @api.onchange("name")
     def _onchange_project_name(self):
         for rec in self:
@@ -26,19 +53,24 @@ class Project(models.Model):
                 continue
 
             if rec.name:
-                rec.key = self.generate_project_key(rec.name)
+                rec.key = self.generate_project_keys([rec.name])[0]
             else:
                 rec.key = ""
 
-    @api.model
-    def create(self, vals):
-        if "key" not in vals:
-            vals["key"] = self.generate_project_key(vals["name"])
+    @api.model_create_multi
+    def create(self, vals_list):
+        pending_vals_list = [vals for vals in vals_list if "key" not in vals]
+        keys = self.generate_project_keys(
+            [vals["name"] for vals in pending_vals_list]
+        )
+        for vals, key in zip(pending_vals_list, keys):
+            vals["key"] = key
 
-        new_project = super(Project, self).create(vals)
-        new_project.create_sequence()
+        new_projects = super(Project, self).create(vals_list)
+        for new_project in new_projects:
+            new_project.create_sequence()
 
-        return new_project
+        return new_projects
 
     def write(self, values):
         update_key = False
@@ -52,8 +84,14 @@ class Project(models.Model):
         if update_key:
             # Here we don't expect to have more than one record
             # because we can not have multiple projects with the same KEY.
+            self.env["project.key.lookup"].invalidate()
             self.update_sequence()
-            self._update_task_keys()
+            if self._use_online_task_key_update():
+                super(Project, self).write(
+                    {"task_key_update_pending": True, "task_key_update_last_id": 0}
+                )
+            else:
+                self._update_task_keys()
 
         return res
 
@@ -62,23 +100,73 @@ class Project(models.Model):
             sequence = project.task_key_sequence_id
             project.task_key_sequence_id = False
             sequence.sudo().unlink()
+        self.env["project.key.lookup"].invalidate()
         return super(Project, self).unlink()
 
     @api.model
     def name_search(self, name, args=None, operator="ilike", limit=100):
-        res = super(Project, self).name_search(name, args, operator, limit)
-        if name:
-            domain = [
-                "|",
-                ("key", "ilike", name + "%"),
-                ("id", "in", [x[0] for x in res]),
-            ]
-            if operator in expression.NEGATIVE_TERM_OPERATORS:
-                domain = ["&", "!"] + domain[1:]
-            projects = self.search(domain + (args or []), limit=limit)
-            return projects.name_get()
-        else:
-            return res
+        args = args or []
+        if not name:
+            return super(Project, self).name_search(name, args, operator, limit)
+
+        if operator in expression.NEGATIVE_TERM_OPERATORS:
+            domain = ["!", ("key", "=ilike", name + "%"), ("name", operator, name)]
+            return self.search(domain + args, limit=limit).name_get()
+
+        query = self._where_calc(
+            ["|", ("key", "=ilike", escape_psql(name) + "%"), ("name", operator, name)]
+            + args
+        )
+        self._apply_ir_rules(query, "read")
+        from_clause, where_clause, where_params = query.get_sql()
+        query_str = """
+            SELECT "project_project".id
+            FROM {}
+            WHERE {}
+            ORDER BY COALESCE(lower("project_project".key) = %s, FALSE) DESC,
+              COALESCE(lower("project_project".key) LIKE %s, FALSE) DESC,
+              "project_project".sequence,
+              "project_project".name,
+              "project_project".id
+            LIMIT %s
+        """.format(
+            from_clause, where_clause or "TRUE"
+        )
+        self.env.cr.execute(
+            query_str,
+            where_params + [name.lower(), escape_psql(name.lower()) + "%", limit],
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()]).name_get()
+
+    @api.model
+    def get_project_by_key(self, key):
+        """
+        This method returns the project identified by the given key.
+        :param key: Project key
+        :return: Returns found project or empty recordset
+        """
+        project_id = self._get_project_id_by_key(key)
+        if project_id:
+            return self.search([("id", "=", project_id)])
+        return self.browse()
+
+    @api.model
+    def _get_project_id_by_key(self, key):
+        return self.env["project.key.lookup"]._get_id(
+            self._name, key.lower(), self._lookup_project_id_by_key
+        )
+
+    @api.model
+    def _lookup_project_id_by_key(self, key):
+        """
+        This method returns id of the project with the given lower case key,
+        or False.
+        """
+        self.env.cr.execute(
+            "SELECT id FROM project_project WHERE lower(key) = %s", (key,)
+        )
+        row = self.env.cr.fetchone()
+        return row and row[0]
 
     def create_sequence(self):
         """
@@ -124,6 +212,26 @@ class Project(models.Model):
             return False
         return self.sudo().task_key_sequence_id.next_by_id()
 
+    def get_next_task_keys(self, count):
+        """
+        This method reserves ``count`` task keys of the current project
+        at once, so that creating many tasks does not draw the sequence
+        once per task.
+        :param count: Number of keys to reserve
+        :return: Returns list of task keys in sequence order
+        """
+        self.ensure_one()
+        test_project_key = self.env.context.get("test_project_key")
+        if config["test_enable"] and not test_project_key:
+            return [False] * count
+
+        sequence = self.sudo().task_key_sequence_id
+        if not count or not sequence:
+            return [False] * count
+
+        sequence.check_access_rights("read")
+        return sequence._next_batch(count)
+
     def generate_project_key(self, text):
         test_project_key = self.env.context.get("test_project_key")
         if config["test_enable"] and not test_project_key:
@@ -141,41 +249,247 @@ class Project(models.Model):
             key.append(item[:1].upper())
         return "".join(key)
 
-    def _update_task_keys(self):
+    def generate_project_keys(self, texts):
+        """
+        This method generates project keys for many project names at once.
+        Keys already in use, or given to a previous name, are suffixed
+        with digits.
+        :param texts: List of project names
+        :return: Returns list of keys, in the order of the given names
+        """
+        size = self._fields["key"].size
+        keys = [
+            (self.generate_project_key(text) or "")[:size] or False for text in texts
+        ]
+        prefixes = {key[: size - 3] for key in keys if key}
+        if not prefixes:
+            return keys
+
+        # Keys are looked up case-insensitively, so they must differ in
+        # lower case
+        self.env.cr.execute(
+            "SELECT lower(key) FROM project_project WHERE lower(key) LIKE ANY(%s)",
+            ([escape_psql(prefix.lower()) + "%" for prefix in prefixes],),
+        )
+        used_keys = {row[0] for row in self.env.cr.fetchall()}
+
+        result = []
+        for key in keys:
+            if key:
+                number = 1
+                unique_key = key
+                while unique_key.lower() in used_keys:
+                    number += 1
+                    suffix = str(number)
+                    unique_key = key[: size - len(suffix)] + suffix
+                used_keys.add(unique_key.lower())
+                key = unique_key
+            result.append(key)
+        return result
+
+    def _use_online_task_key_update(self):
+        """
+        Task keys of projects having more tasks than the
+        ``project_key.online_update_threshold`` parameter are updated
+        in chunks by a scheduled action instead of within the write.
+        """
+        self.ensure_one()
+        threshold = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("project_key.online_update_threshold", 0)
+        )
+        if not threshold:
+            return False
+        return (
+            self.env["project.task"]
+            .with_context(active_test=False)
+            .search_count([("project_id", "=", self.id)])
+            > threshold
+        )
+
+    def _update_task_keys(self, last_id=0, limit=None):
         """
         This method will update task keys of the current project.
+        Replaced keys are kept as task key aliases.
+        :param last_id: Only tasks with greater id are updated
+        :param limit: Maximum number of tasks to update, ordered by id
+        :return: Returns id of the last processed task, 0 if there was none
         """
         self.ensure_one()
         self.flush()
         reindex_query = """
-        UPDATE project_task
-        SET key = x.key
-        FROM (
-          SELECT t.id, p.key || '-' || split_part(t.key, '-', 2) AS key
+        WITH x AS (
+          SELECT t.id, t.key AS old_key,
+            p.key || '-' || split_part(t.key, '-', 2) AS key
           FROM project_task t
           INNER JOIN project_project p ON t.project_id = p.id
-          WHERE t.project_id = %s
-        ) AS x
-        WHERE project_task.id = x.id;
+          WHERE t.project_id = %(project_id)s AND t.id > %(last_id)s
+          ORDER BY t.id
+          LIMIT %(limit)s
+        ), updated AS (
+          UPDATE project_task
+          SET key = x.key
+          FROM x
+          WHERE project_task.id = x.id AND project_task.key <> x.key
+          RETURNING x.id, x.old_key
+        ), alias AS (
+          INSERT INTO project_task_key_alias
+            (key, task_id, create_uid, create_date, write_uid, write_date)
+          SELECT old_key, id, %(uid)s, %(now)s, %(uid)s, %(now)s
+          FROM updated
+          ON CONFLICT (key) DO UPDATE SET task_id = EXCLUDED.task_id
+        )
+        SELECT (SELECT max(id) FROM x), (SELECT array_agg(id) FROM updated);
         """
 
-        self.env.cr.execute(reindex_query, (self.id,))
-        self.env["project.task"].invalidate_cache(["key"], self.task_ids.ids)
+        self.env.cr.execute(
+            reindex_query,
+            {
+                "project_id": self.id,
+                "last_id": last_id,
+                "limit": limit,
+                "uid": self.env.uid,
+                "now": fields.Datetime.now(),
+            },
+        )
+        last_id, task_ids = self.env.cr.fetchone()
+        self.env["project.task"].invalidate_cache(["key"], task_ids or [])
+        self.env["project.task.key.alias"].invalidate_cache()
+        if task_ids:
+            self.env["project.key.lookup"].invalidate()
+        return last_id or 0
+
+    def _update_task_keys_online(self, chunk_size=REKEY_CHUNK_SIZE):
+        """
+        This method updates task keys of the current project in chunks
+        of ``chunk_size`` tasks, committing after each chunk, so it can be
+        resumed from the last updated task.
+        The progress is read again before each chunk, and only saved if it
+        did not change meanwhile: when the key of the project changes again
+        during the update, the update starts over from the first task.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        progress_fields = ["key", "task_key_update_pending", "task_key_update_last_id"]
+        while True:
+            self.invalidate_cache(progress_fields, self.ids)
+            if not self.task_key_update_pending:
+                break
+            key, last_id = self.key, self.task_key_update_last_id
+            try:
+                new_last_id = self._update_task_keys(last_id=last_id, limit=chunk_size)
+                self.flush(progress_fields)
+                cr.execute(
+                    """
+                    UPDATE project_project
+                    SET task_key_update_pending = %s, task_key_update_last_id = %s
+                    WHERE id = %s AND key = %s AND task_key_update_pending
+                      AND task_key_update_last_id = %s
+                    """,
+                    (bool(new_last_id), new_last_id, self.id, key, last_id),
+                )
+                saved = bool(cr.rowcount)
+                cr.commit()  # pylint: disable=invalid-commit
+            except TransactionRollbackError:
+                # The project was changed by a concurrent transaction
+                cr.rollback()
+                self.env.clear()
+                continue
+            if saved:
+                _logger.info(
+                    "Task keys of project %s updated up to task %s", key, new_last_id
+                )
+            else:
+                _logger.info("Task keys of project %s changed, starting over", key)
+
+    @api.model
+    def _cron_update_task_keys(self, chunk_size=REKEY_CHUNK_SIZE):
+        for project in self.search([("task_key_update_pending", "=", True)]):
+            project._update_task_keys_online(chunk_size)
 
     @api.model
-    def _set_default_project_key(self):
+    def _set_default_project_key(self, chunk_size=BACKFILL_CHUNK_SIZE, commit=False):
         """
         This method will be called from the post_init hook in order to set
         default values on project.project and
         project.task, so we leave those tables nice and clean after module
         installation.
+        Task keys are numbered per project in SQL and written in chunks
+        of ``chunk_size`` tasks.
+        :param chunk_size: Number of tasks updated per statement
+        :param commit: Set to True to commit the transaction after each chunk
         :return:
         """
-        for project in self.with_context(active_test=False).search(
-            [("key", "=", False)]
-        ):
-            project.key = self.generate_project_key(project.name)
+        projects = self.with_context(active_test=False).search([("key", "=", False)])
+        keys = self.generate_project_keys(projects.mapped("name"))
+        for project, key in zip(projects, keys):
+            project.key = key
             project.create_sequence()
 
-            for task in project.task_ids:
-                task.key = project.get_next_task_key()
+        projects = projects.filtered("key")
+        if not projects:
+            return
+
+        self.flush()
+        cr = self.env.cr
+        cr.execute(
+            """
+            CREATE TEMPORARY TABLE project_key_backfill AS
+            SELECT t.id, t.project_id, p.key || '-' || row_number() OVER (
+                PARTITION BY t.project_id ORDER BY t.id
+            ) AS key
+            FROM project_task t
+            INNER JOIN project_project p ON t.project_id = p.id
+            WHERE t.project_id IN %s;
+            ALTER TABLE project_key_backfill ADD PRIMARY KEY (id);
+            """,
+            (tuple(projects.ids),),
+        )
+        cr.execute(
+            """
+            SELECT project_id, count(*)
+            FROM project_key_backfill
+            GROUP BY project_id
+            """
+        )
+        task_counts = dict(cr.fetchall())
+        for project in projects.filtered(lambda p: p.id in task_counts):
+            project.task_key_sequence_id.sudo().write(
+                {"number_next": task_counts[project.id] + 1}
+            )
+        if commit:
+            cr.commit()  # pylint: disable=invalid-commit
+
+        total = sum(task_counts.values())
+        done = 0
+        last_id = 0
+        while done < total:
+            cr.execute(
+                """
+                UPDATE project_task
+                SET key = b.key
+                FROM (
+                  SELECT id, key
+                  FROM project_key_backfill
+                  WHERE id > %s
+                  ORDER BY id
+                  LIMIT %s
+                ) AS b
+                WHERE project_task.id = b.id
+                RETURNING project_task.id;
+                """,
+                (last_id, chunk_size),
+            )
+            task_ids = [row[0] for row in cr.fetchall()]
+            if not task_ids:
+                break
+            last_id = max(task_ids)
+            done += len(task_ids)
+            if commit:
+                cr.commit()  # pylint: disable=invalid-commit
+            _logger.info("Task keys assigned: %s/%s", done, total)
+
+        cr.execute("DROP TABLE project_key_backfill")
+        self.env["project.task"].invalidate_cache(["key"])
+        self.env["project.key.lookup"].invalidate()
@@ -1,11 +1,20 @@
 # Copyright 2017 - 2018 Modoolar <info@modoolar.com>
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
-from odoo import api, fields, models
+import logging
+import re
+
+from odoo import api, fields, models, tools
 from odoo.osv import expression
+from odoo.tools.misc import escape_psql
+
+_logger = logging.getLogger(__name__)
 
 TASK_URL = "/web#id=%s&view_type=form&model=project.task&action=%s"
 
+# Project keys may end with digits, e.g. "OCA2" when "OCA" is already used
+KEY_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9]*-\d+$")
+
 
 class Task(models.Model):
     _inherit = "project.task"
@@ -16,13 +25,69 @@ class Task(models.Model):
 
     _sql_constraints = [("task_key_unique", "UNIQUE(key)", "Task key must be unique!")]
 
+    def init(self):
+        super(Task, self).init()
+        # The prefix index also serves lookups of exact keys
+        tools.create_index(
+            self._cr,
+            "project_task_key_lower_prefix_index",
+            self._table,
+            ["lower(key) text_pattern_ops"],
+        )
+        self._cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if self._cr.fetchone():
+            self._cr.execute(
+                """
+                CREATE INDEX IF NOT EXISTS project_task_name_trgm_index
+                ON project_task USING gin (name gin_trgm_ops)
+                """
+            )
+        else:
+            _logger.info(
+                "pg_trgm extension is not installed, task name search "
+                "is not backed by a trigram index"
+            )
+
     def _compute_task_url(self):
-        action_id = self.env.ref("project.action_view_task").id
+        action_id = self._get_task_action_id()
         for task in self:
             task.url = TASK_URL % (task.id, action_id)
 
+    @tools.ormcache()
+    def _get_task_action_id(self):
+        return self.env.ref("project.action_view_task").id
+
+    @api.model
+    def format_task_url(self, task_id):
+        """
+        This method formats the url of the task with the given id, without
+        reading the task.
+        :param task_id: Task id
+        :return: Returns task url
+        """
+        return TASK_URL % (task_id, self._get_task_action_id())
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        vals_by_project = {}
+        for vals in vals_list:
+            project_id = self._get_key_project_id(vals)
+            if project_id:
+                vals_by_project.setdefault(project_id, []).append(vals)
+
+        for project_id, project_vals_list in vals_by_project.items():
+            project = self.env["project.project"].browse(project_id)
+            keys = project.get_next_task_keys(len(project_vals_list))
+            for vals, key in zip(project_vals_list, keys):
+                vals["key"] = key
+        return super(Task, self).create(vals_list)
+
     @api.model
-    def create(self, vals):
+    def _get_key_project_id(self, vals):
+        """
+        This method returns id of the project which will give the key
+        to the task created with the given values.
+        """
         get = self.env.context.get
 
         project_id = vals.get("project_id", False)
@@ -32,46 +97,262 @@ class Task(models.Model):
         if not project_id and get("active_model", False) == "project.project":
             project_id = get("active_id", False)
 
-        if project_id:
-            project = self.env["project.project"].browse(project_id)
-            vals["key"] = project.get_next_task_key()
-        return super(Task, self).create(vals)
+        return project_id
 
     def write(self, vals):
+        if "key" in vals:
+            self.env["project.key.lookup"].invalidate()
+
         project_id = vals.get("project_id", False)
         if not project_id:
             return super(Task, self).write(vals)
 
         project = self.env["project.project"].browse(project_id)
-        for task in self:
-            if task.key and task.project_id.id == project.id:
-                continue
-
-            values = self.prepare_task_for_project_switch(task, project)
-            super(Task, task).write(values)
+        tasks = self.filtered(lambda t: not t.key or t.project_id != project)
+        if tasks:
+            tasks.switch_project(project)
 
         return super(Task, self).write(vals)
 
-    def prepare_task_for_project_switch(self, task, project):
-        data = {"key": project.get_next_task_key(), "project_id": project.id}
+    def switch_project(self, project):
+        """
+        This method moves the current tasks and all of their subtasks to the
+        given project, giving them new keys of that project.
+        The project of the current tasks themselves is left to the caller,
+        so that the ORM write tracks it. The project of their subtasks is
+        written in SQL, after checking write access on them: overrides of
+        ``write`` are not run for subtasks, e.g. their project change is not
+        tracked and hr_timesheet does not move their timesheet lines.
+        :param project: Target project
+        :return: Returns moved subtasks
+        """
+        if not self:
+            return self
 
-        if len(task.child_ids) > 0:
-            data["child_ids"] = [
-                (1, child.id, self.prepare_task_for_project_switch(child, project))
-                for child in task.child_ids
-            ]
-        return data
+        self.flush(["key", "parent_id", "project_id"])
+        cr = self.env.cr
+        cr.execute(
+            """
+            WITH RECURSIVE subtree(id) AS (
+              SELECT id FROM project_task WHERE id IN %s
+              UNION
+              SELECT t.id
+              FROM project_task t
+              INNER JOIN subtree s ON t.parent_id = s.id
+            )
+            SELECT id FROM subtree ORDER BY id;
+            """,
+            (tuple(self.ids),),
+        )
+        task_ids = [row[0] for row in cr.fetchall()]
+        subtasks = self.browse(task_ids) - self
+        subtasks.check_access_rights("write")
+        subtasks.check_access_rule("write")
+        keys = [key or None for key in project.get_next_task_keys(len(task_ids))]
+
+        cr.execute(
+            """
+            UPDATE project_task
+            SET key = x.key,
+                project_id = CASE
+                  WHEN project_task.id IN %s THEN project_task.project_id
+                  ELSE %s
+                END,
+                write_uid = %s,
+                write_date = now() at time zone 'UTC'
+            FROM unnest(%s, %s::varchar[]) AS x(id, key)
+            WHERE project_task.id = x.id;
+            """,
+            (tuple(self.ids), project.id, self.env.uid, task_ids, keys),
+        )
+
+        self.invalidate_cache(["key", "write_uid", "write_date"], task_ids)
+        self.invalidate_cache(["project_id"], subtasks.ids)
+        self.env["project.project"].invalidate_cache(["task_ids", "tasks"])
+        subtasks.modified(["project_id"])
+        self.env["project.key.lookup"].invalidate()
+        return subtasks
+
+    @api.model
+    def get_task_by_key(self, key):
+        """
+        This method returns the task identified by the given key. Former
+        keys are resolved through task key aliases, and keys of projects
+        whose task keys are still being updated are resolved by number.
+        :param key: Task key
+        :return: Returns found task or empty recordset
+        """
+        task_id = self._get_task_id_by_key(key)
+        if task_id:
+            return self.search([("id", "=", task_id)])
+
+        project_key, __, number = key.rpartition("-")
+        if project_key and number.isdigit():
+            project = self.env["project.project"].search(
+                [
+                    ("key", "=ilike", project_key),
+                    ("task_key_update_pending", "=", True),
+                ],
+                limit=1,
+            )
+            if project:
+                return self.search(
+                    [("project_id", "=", project.id), ("key", "=like", "%-" + number)],
+                    limit=1,
+                )
+        return self.browse()
+
+    @api.model
+    def resolve_task_keys(self, keys):
+        """
+        This method resolves many task keys at once, former keys included.
+        :param keys: List of task keys
+        :return: Returns dictionary mapping each given key to a dictionary
+        with id, key, name, stage and url of its task, or to None
+        """
+        return self._read_resolved_tasks(keys, self._resolve_task_key_ids(keys))
+
+    @api.model
+    def _resolve_task_key_ids(self, keys):
+        """
+        This method returns the ids of the tasks owning, or formerly owning,
+        the given keys.
+        :param keys: List of task keys
+        :return: Returns dictionary mapping found lower case keys to task ids
+        """
+        lower_keys = list({key.lower() for key in keys})
+        if not lower_keys:
+            return {}
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT ON (key) key, task_id
+            FROM (
+              SELECT lower(key) AS key, id AS task_id, 0 AS priority
+              FROM project_task
+              WHERE lower(key) = ANY(%(keys)s)
+              UNION ALL
+              SELECT lower(key), task_id, 1
+              FROM project_task_key_alias
+              WHERE lower(key) = ANY(%(keys)s)
+            ) AS x
+            ORDER BY key, priority;
+            """,
+            {"keys": lower_keys},
+        )
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_resolved_tasks_version(self, task_ids):
+        """
+        This method returns a value changing whenever the resolution of the
+        given tasks may change: their keys, or the last update of the tasks
+        or of their stages. Keys are included as they may be rewritten in
+        SQL without updating the tasks.
+        """
+        if not task_ids:
+            return None
+        self.flush(["key", "name", "stage_id"])
+        self.env.cr.execute(
+            """
+            SELECT max(greatest(t.write_date, s.write_date))::varchar,
+              string_agg(t.key, ',' ORDER BY t.id)
+            FROM project_task t
+            LEFT JOIN project_task_type s ON s.id = t.stage_id
+            WHERE t.id IN %s
+            """,
+            (tuple(task_ids),),
+        )
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _read_resolved_tasks(self, keys, task_ids):
+        tasks = {
+            task["id"]: {
+                "id": task["id"],
+                "key": task["key"],
+                "name": task["name"],
+                "stage": task["stage_id"] and task["stage_id"][1],
+                "url": self.format_task_url(task["id"]),
+            }
+            for task in self.search_read(
+                [("id", "in", list(task_ids.values()))], ["key", "name", "stage_id"]
+            )
+        }
+        return {key: tasks.get(task_ids.get(key.lower())) for key in keys}
+
+    @api.model
+    def _get_task_id_by_key(self, key):
+        return self.env["project.key.lookup"]._get_id(
+            self._name, key.lower(), self._lookup_task_id_by_key
+        )
+
+    @api.model
+    def _lookup_task_id_by_key(self, key):
+        """
+        This method returns id of the task owning the given lower case key,
+        or formerly owning it, or False.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id FROM project_task WHERE lower(key) = %s
+            UNION ALL
+            SELECT task_id FROM project_task_key_alias WHERE lower(key) = %s
+            LIMIT 1;
+            """,
+            (key, key),
+        )
+        row = self.env.cr.fetchone()
+        return row and row[0]
 
     @api.model
     def name_search(self, name, args=None, operator="ilike", limit=100):
         args = args or []
-        domain = []
-        if name:
-            domain = ["|", ("key", "=ilike", name + "%"), ("name", operator, name)]
-            if operator in expression.NEGATIVE_TERM_OPERATORS:
-                domain = ["&", "!"] + domain[1:]
-        tasks = self.search(domain + args, limit=limit)
-        return tasks.name_get()
+        if not name:
+            return self.search(args, limit=limit).name_get()
+
+        if operator in expression.NEGATIVE_TERM_OPERATORS:
+            domain = ["!", ("key", "=ilike", name + "%"), ("name", operator, name)]
+            return self.search(domain + args, limit=limit).name_get()
+
+        # Exact key match first, then longer keys with the same prefix; the
+        # name is not searched when the input is a key of existing tasks
+        task_ids = self._search_key_prefix(name, args, limit)
+        if task_ids and KEY_PATTERN.match(name):
+            return self.browse(task_ids).name_get()
+        if limit is None or len(task_ids) < limit:
+            task_ids += self._search(
+                [("name", operator, name), ("id", "not in", task_ids)] + args,
+                limit=limit and limit - len(task_ids),
+            )
+        return self.browse(task_ids).name_get()
+
+    @api.model
+    def _search_key_prefix(self, prefix, args=None, limit=None):
+        """
+        This method searches tasks whose key starts with the given prefix,
+        served by the lower(key) prefix index.
+        :return: Returns list of task ids, the exact key match first, then
+        shorter keys first
+        """
+        query = self._where_calc(args or [])
+        self._apply_ir_rules(query, "read")
+        from_clause, where_clause, where_params = query.get_sql()
+        query_str = """
+            SELECT "project_task".id
+            FROM {}
+            WHERE {} lower("project_task".key) LIKE %s
+            ORDER BY lower("project_task".key) = %s DESC,
+              length("project_task".key),
+              "project_task".key
+            LIMIT %s
+        """.format(
+            from_clause, where_clause and "({}) AND".format(where_clause) or ""
+        )
+        prefix = prefix.lower()
+        self.env.cr.execute(
+            query_str, where_params + [escape_psql(prefix) + "%", prefix, limit]
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
 
     def name_get(self):
         result = []
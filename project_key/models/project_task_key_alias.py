@@ -0,0 +1,26 @@
+# License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
+
+from odoo import fields, models, tools
+
+
+class TaskKeyAlias(models.Model):
+    _name = "project.task.key.alias"
+    _description = "Former Task Key"
+
+    key = fields.Char(string="Key", size=20, required=True, index=True)
+
+    task_id = fields.Many2one(
+        comodel_name="project.task", string="Task", required=True, ondelete="cascade"
+    )
+
+    _sql_constraints = [
+        ("task_key_alias_unique", "UNIQUE(key)", "Task key alias must be unique!")
+    ]
+
+    def init(self):
+        tools.create_index(
+            self._cr,
+            "project_task_key_alias_key_lower_index",
+            self._table,
+            ["lower(key)"],
+        )
@@ -3,3 +3,4 @@
 from . import test_project
 from . import test_task
 from . import test_controller
+from . import test_benchmark
@@ -0,0 +1,75 @@
+# License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
+
+import logging
+import os
+import time
+
+from odoo.tests.common import tagged
+
+from .test_common import TestCommon
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+NAME_SEARCH_TASKS = int(os.environ.get("PROJECT_KEY_BENCHMARK_TASKS", 1000000))
+NAME_SEARCH_RUNS = 20
+
+
+@tagged("-standard", "benchmark")
+class TestBenchmark(TestCommon):
+    """Benchmarks are not run by default, use ``--test-tags benchmark``."""
+
+    def count_queries(self, func, *args):
+        self.env["base"].flush()
+        count = self.cr.sql_log_count
+        result = func(*args)
+        self.env["base"].flush()
+        return result, self.cr.sql_log_count - count
+
+    def test_create_task_queries(self):
+        vals_list = [
+            {"name": "Task %s" % i, "project_id": self.project_3.id}
+            for i in range(BATCH_SIZE)
+        ]
+        tasks, batch_count = self.count_queries(self.Task.create, vals_list)
+        self.assertEqual(len(set(tasks.mapped("key"))), BATCH_SIZE)
+
+        def create_one_by_one():
+            for vals in vals_list:
+                self.Task.create(dict(vals))
+
+        _dummy, single_count = self.count_queries(create_one_by_one)
+        _logger.info(
+            "Queries per %s created tasks: %s in batch, %s one by one",
+            BATCH_SIZE,
+            batch_count,
+            single_count,
+        )
+        self.assertLess(batch_count, single_count)
+
+    def test_name_search_latency(self):
+        self.env["base"].flush()
+        self.cr.execute(
+            """
+            INSERT INTO project_task (
+              name, key, project_id, company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'Benchmark task ' || md5(i::text), 'PYT-' || i, project_id,
+              company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            FROM project_task, generate_series(1, %s) AS i
+            WHERE id = %s
+            """,
+            (NAME_SEARCH_TASKS, self.task11.id),
+        )
+        self.cr.execute("ANALYZE project_task")
+
+        for name in ("PYT-%s" % (NAME_SEARCH_TASKS // 2), "PYT-12", "a1b2"):
+            start = time.time()
+            for _i in range(NAME_SEARCH_RUNS):
+                self.Task.name_search(name, limit=8)
+            elapsed = (time.time() - start) * 1000 / NAME_SEARCH_RUNS
+            _logger.info(
+                "name_search(%r) on %s tasks: %.2f ms", name, NAME_SEARCH_TASKS, elapsed
+            )
@@ -1,6 +1,8 @@
 # Copyright 2017 - 2018 Modoolar <info@modoolar.com>
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
+import json
+
 from mock import patch
 
 from odoo import http
@@ -30,3 +32,58 @@ class TestController(HttpTestCommon):
 
             self.assertEqual(response.status_code, 301)
             self.assertEqual(response.location, self.get_task_url(self.task11))
+
+    def test_03_task_browse_former_key(self):
+        self.project_1.key = "XXX"
+        with patch.object(http, "request") as request:
+            request.env = self.env
+            controller = ProjectBrowser()
+            response = controller.open_task("OCA-1")
+
+            self.assertEqual(response.status_code, 301)
+            self.assertEqual(response.location, self.get_task_url(self.task11))
+
+    def test_04_browse_case_insensitive(self):
+        with patch.object(http, "request") as request:
+            request.env = self.env
+            controller = ProjectBrowser()
+            response = controller.open_task("oca-2")
+            self.assertEqual(response.location, self.get_task_url(self.task12))
+
+            response = controller.open_project("odoo")
+            self.assertEqual(response.location, self.get_project_url(self.project_2))
+
+    def test_05_browse_after_key_change(self):
+        Task = self.env["project.task"]
+        self.assertEqual(Task.get_task_by_key("OCA-1"), self.task11)
+        self.task11.write({"project_id": self.project_3.id})
+        self.assertEqual(Task.get_task_by_key("PYT-1"), self.task11)
+        self.assertEqual(Task.get_task_by_key("PYT-2"), self.task12)
+
+    def test_06_resolve_tasks(self):
+        with patch.object(http, "request") as request:
+            request.env = self.env
+            request.httprequest.headers = {}
+            controller = ProjectBrowser()
+            response = controller.resolve_tasks("OCA-1, ODOO-1,XYZ-3")
+
+            self.assertEqual(response.status_code, 200)
+            result = json.loads(response.get_data())
+            self.assertEqual(result["OCA-1"]["id"], self.task11.id)
+            self.assertEqual(result["ODOO-1"]["id"], self.task21.id)
+            self.assertIsNone(result["XYZ-3"])
+
+            etag = response.headers["ETag"]
+            request.httprequest.headers = {"If-None-Match": etag}
+            with patch.object(
+                type(self.env["project.task"]), "_read_resolved_tasks"
+            ) as read_resolved_tasks:
+                response = controller.resolve_tasks("OCA-1, ODOO-1,XYZ-3")
+            self.assertEqual(response.status_code, 304)
+            read_resolved_tasks.assert_not_called()
+
+            # Keys rewritten in SQL, the former key resolves to the same task
+            self.project_2.key = "ODX"
+            response = controller.resolve_tasks("OCA-1, ODOO-1,XYZ-3")
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["ETag"], etag)
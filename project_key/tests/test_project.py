@@ -1,6 +1,8 @@
 # Copyright 2017 - 2018 Modoolar <info@modoolar.com>
 # License LGPLv3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
+from mock import patch
+
 from .test_common import TestCommon
 
 
@@ -62,3 +64,115 @@ class TestProject(TestCommon):
         project = self.Project.new({"name": "Software Development", "key": "TEST"})
         project._onchange_project_name()
         self.assertEqual(project.key, "TEST")
+
+    def test_10_set_default_project_key(self):
+        self.env.cr.execute(
+            "UPDATE project_project SET key = NULL WHERE id = %s", (self.project_1.id,)
+        )
+        self.env.cr.execute(
+            "UPDATE project_task SET key = NULL WHERE project_id = %s",
+            (self.project_1.id,),
+        )
+        self.env["project.project"].invalidate_cache(["key"])
+        self.env["project.task"].invalidate_cache(["key"])
+
+        self.Project._set_default_project_key(chunk_size=1)
+
+        self.assertEqual(self.project_1.key, "OCA")
+        self.assertEqual(self.task11.key, "OCA-1")
+        self.assertEqual(self.task12.key, "OCA-2")
+        self.assertEqual(self.project_1.get_next_task_key(), "OCA-3")
+
+    def test_11_update_task_keys_chunked(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "project_key.online_update_threshold", 1
+        )
+        self.project_1.key = "XXX"
+        self.assertTrue(self.project_1.task_key_update_pending)
+        self.assertEqual(self.task11.key, "OCA-1")
+
+        last_id = self.project_1._update_task_keys(limit=1)
+        self.assertEqual(last_id, self.task11.id)
+        self.assertEqual(self.task11.key, "XXX-1")
+        self.assertEqual(self.task12.key, "OCA-2")
+
+        Task = self.env["project.task"]
+        self.assertEqual(Task.get_task_by_key("OCA-1"), self.task11)
+        self.assertEqual(Task.get_task_by_key("XXX-2"), self.task12)
+
+        last_id = self.project_1._update_task_keys(last_id=last_id, limit=1)
+        self.assertEqual(last_id, self.task12.id)
+        self.assertEqual(self.task12.key, "XXX-2")
+        self.assertEqual(Task.get_task_by_key("OCA-2"), self.task12)
+        self.assertEqual(self.project_1._update_task_keys(last_id=last_id), 0)
+
+    def test_12_name_search_ranking(self):
+        # Projects without key do not outrank key matches
+        self.Project.create({"name": "Odd Jobs", "key": False})
+        project = self.Project.create({"name": "Odoo Apps", "key": "OD"})
+        result = self.Project.name_search("od", limit=2)
+        self.assertEqual([x[0] for x in result], [project.id, self.project_2.id])
+
+        result = self.Project.name_search("odoo", limit=1)
+        self.assertEqual([x[0] for x in result], [self.project_2.id])
+
+        # Name matches keep the default order of projects
+        projects = self.Project.create(
+            [
+                {"name": "Zeta Quuxtools", "key": "ZQ"},
+                {"name": "Alpha Quuxtools", "key": "AQ"},
+            ]
+        )
+        result = self.Project.name_search("quuxtools")
+        self.assertEqual([x[0] for x in result], projects[::-1].ids)
+
+    def test_13_name_search_empty(self):
+        projects = self.Project.name_search("", limit=None)
+        project = self.Project.create({"name": "Unsearched"})
+        self.assertEqual(
+            len(self.Project.name_search("", limit=None)), len(projects) + 1
+        )
+        self.assertIn(
+            (project.id, "Unsearched"), self.Project.name_search("", limit=None)
+        )
+
+    def test_14_create_multi_unique_keys(self):
+        projects = self.Project.create(
+            [{"name": "OCA"}, {"name": "Other Cool App"}, {"name": "Octave"}]
+        )
+        self.assertEqual(projects.mapped("key"), ["OCA2", "OCA3", "OCT"])
+        self.assertTrue(all(projects.mapped("task_key_sequence_id")))
+
+    def test_15_generate_project_keys_size(self):
+        keys = self.Project.generate_project_keys(["A B C D E F G H I J K L", "OCA"])
+        self.assertEqual(keys, ["ABCDEFGHIJ", "OCA2"])
+
+    def test_16_update_task_keys_online_key_changed(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "project_key.online_update_threshold", 1
+        )
+        self.project_1.key = "XXX"
+        Project = type(self.project_1)
+        update_task_keys = Project._update_task_keys
+        changed = []
+
+        def update_and_change_key(project, last_id=0, limit=None):
+            result = update_task_keys(project, last_id=last_id, limit=limit)
+            if not changed:
+                # The key changes again while the first chunk is updated
+                changed.append(True)
+                project.key = "YYY"
+            return result
+
+        with patch.object(Project, "_update_task_keys", update_and_change_key):
+            with patch.object(self.env.cr, "commit"):
+                self.project_1._update_task_keys_online(chunk_size=1)
+
+        self.assertFalse(self.project_1.task_key_update_pending)
+        self.assertEqual(self.task11.key, "YYY-1")
+        self.assertEqual(self.task12.key, "YYY-2")
+
+    def test_17_generate_project_keys_case_insensitive(self):
+        self.Project.create({"name": "Lower", "key": "pyt2"})
+        keys = self.Project.generate_project_keys(["Python", "python"])
+        self.assertEqual(keys, ["PYT3", "PYT4"])
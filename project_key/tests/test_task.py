@@ -49,3 +49,97 @@ class TestTask(TestCommon):
     def test_07_name_search_empty(self):
         tasks = self.Task.name_search("")
         self.assertGreater(len(tasks), 0)
+
+    def test_08_create_multi(self):
+        tasks = self.Task.create(
+            [
+                {"name": "5", "project_id": self.project_1.id},
+                {"name": "6", "project_id": self.project_2.id},
+                {"name": "7", "project_id": self.project_1.id},
+                {"name": "8"},
+            ]
+        )
+        self.assertEqual(tasks.mapped("key"), ["OCA-3", "ODOO-2", "OCA-4", False])
+
+    def test_09_next_task_keys(self):
+        keys = self.project_1.get_next_task_keys(3)
+        self.assertEqual(keys, ["OCA-3", "OCA-4", "OCA-5"])
+        self.assertEqual(self.project_1.get_next_task_key(), "OCA-6")
+
+    def test_10_next_task_keys_no_gap(self):
+        self.project_1.task_key_sequence_id.implementation = "no_gap"
+        keys = self.project_1.get_next_task_keys(2)
+        self.assertEqual(keys, ["OCA-3", "OCA-4"])
+        self.assertEqual(self.project_1.get_next_task_key(), "OCA-5")
+
+    def test_11_switch_project_subtree(self):
+        task13 = self.Task.create(
+            {"name": "9", "parent_id": self.task12.id, "project_id": self.project_1.id}
+        )
+        self.task11.write({"project_id": self.project_3.id})
+        self.assertEqual(self.task11.key, "PYT-1")
+        self.assertEqual(self.task12.key, "PYT-2")
+        self.assertEqual(task13.key, "PYT-3")
+        self.assertEqual(task13.project_id, self.project_3)
+        self.assertEqual(self.project_3.task_ids, self.task11 | self.task12 | task13)
+        self.assertFalse(self.project_1.task_ids)
+
+    def test_12_resolve_task_keys(self):
+        result = self.Task.resolve_task_keys(["OCA-1", "oca-2", "XYZ-3"])
+        self.assertEqual(result["OCA-1"]["id"], self.task11.id)
+        self.assertEqual(result["OCA-1"]["url"], self.get_task_url(self.task11))
+        self.assertEqual(result["oca-2"]["key"], "OCA-2")
+        self.assertIsNone(result["XYZ-3"])
+
+    def test_13_name_search_key(self):
+        self.Task.create(
+            [{"name": "OCA-1 follow-up", "project_id": self.project_2.id}]
+            + [{"name": str(i), "project_id": self.project_1.id} for i in range(10)]
+        )
+        result = self.Task.name_search("oca-1")
+        self.assertEqual(
+            self.Task.browse([x[0] for x in result]).mapped("key"),
+            ["OCA-1", "OCA-10", "OCA-11", "OCA-12"],
+        )
+
+        result = self.Task.name_search("OCA-1", limit=3)
+        self.assertEqual(result[0][0], self.task11.id)
+
+        result = self.Task.name_search("OCA", limit=2)
+        self.assertEqual([x[0] for x in result], [self.task11.id, self.task12.id])
+
+    def test_14_name_search_name(self):
+        task = self.Task.create({"name": "Refactor xyzzy parser"})
+        result = self.Task.name_search("XYZZY")
+        self.assertEqual([x[0] for x in result], [task.id])
+
+    def test_15_format_task_url(self):
+        self.assertEqual(
+            self.Task.format_task_url(self.task11.id), self.get_task_url(self.task11)
+        )
+
+    def test_16_key_lookup_cache(self):
+        Lookup = self.env["project.key.lookup"]
+        self.assertEqual(self.Task._get_task_id_by_key("OCA-1"), self.task11.id)
+        hits = Lookup.get_stats()["hits"]
+        with self.assertQueryCount(0):
+            self.assertEqual(self.Task._get_task_id_by_key("oca-1"), self.task11.id)
+        self.assertEqual(Lookup.get_stats()["hits"], hits + 1)
+
+        # Unknown keys are not kept in the cache
+        self.assertFalse(self.Task._get_task_id_by_key("OCA-100"))
+
+        # The transaction rewriting keys neither reads nor fills the cache
+        self.task11.key = "OCA-100"
+        stats = Lookup.get_stats()
+        self.assertEqual(self.Task._get_task_id_by_key("OCA-100"), self.task11.id)
+        self.assertFalse(self.Task._get_task_id_by_key("OCA-1"))
+        self.assertEqual(Lookup.get_stats(), stats)
+
+    def test_17_name_search_key_with_digits(self):
+        project = self.Project.create({"name": "OCA"})
+        self.assertEqual(project.key, "OCA2")
+        task = self.Task.create({"name": "Follow-up", "project_id": project.id})
+        self.Task.create({"name": "OCA2-1 notes", "project_id": self.project_2.id})
+        result = self.Task.name_search("oca2-1")
+        self.assertEqual([x[0] for x in result], [task.id])
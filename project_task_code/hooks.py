@@ -1,7 +1,14 @@
 # Copyright 2016 Tecnativa <vicent.cubells@tecnativa.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import logging
+
 from odoo import SUPERUSER_ID, api
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50000
 
 
 def pre_init_hook(cr):
@@ -20,11 +27,87 @@ def post_init_hook(cr, registry):
     corresponding sequence code.
     """
     env = api.Environment(cr, SUPERUSER_ID, dict())
-    task_obj = env["project.task"]
-    sequence_obj = env["ir.sequence"]
-    tasks = task_obj.search([], order="id")
-    for task_id in tasks.ids:
-        cr.execute(
-            "UPDATE project_task " "SET code = %s " "WHERE id = %s;",
-            (sequence_obj.next_by_code("project.task"), task_id),
-        )
+    chunk_size = int(config.get("project_task_code_chunk_size", CHUNK_SIZE))
+    assign_task_codes(env, chunk_size)
+
+
+def assign_task_codes(env, chunk_size=CHUNK_SIZE):
+    """
+    Assign a sequence code to every task, in id order, updating ``chunk_size``
+    tasks per statement. Codes of standard sequences are drawn from the
+    PostgreSQL sequence within the UPDATE itself.
+    """
+    cr = env.cr
+    sequence = env["ir.sequence"].search(
+        [("code", "=", "project.task"), ("company_id", "in", [env.company.id, False])],
+        order="company_id",
+        limit=1,
+    )
+    cr.execute("SELECT count(*) FROM project_task")
+    total = cr.fetchone()[0]
+    done = 0
+    last_id = 0
+    while done < total:
+        if sequence.implementation == "standard" and not sequence.use_date_range:
+            prefix, suffix = sequence._get_prefix_suffix()
+            cr.execute(
+                """
+                UPDATE project_task
+                SET code = x.code,
+                  display_code_name = '[' || x.code || '] ' || project_task.name
+                FROM (
+                  SELECT id, %(prefix)s || CASE
+                      WHEN length(number::text) >= %(padding)s THEN number::text
+                      ELSE lpad(number::text, %(padding)s, '0')
+                    END || %(suffix)s AS code
+                  FROM (
+                    SELECT id, nextval(%(sequence)s) AS number
+                    FROM (
+                      SELECT id FROM project_task
+                      WHERE id > %(last_id)s
+                      ORDER BY id
+                      LIMIT %(limit)s
+                    ) AS t
+                  ) AS n
+                ) AS x
+                WHERE project_task.id = x.id
+                RETURNING project_task.id;
+                """,
+                {
+                    "prefix": prefix,
+                    "suffix": suffix,
+                    "padding": sequence.padding,
+                    "sequence": "ir_sequence_%03d" % sequence.id,
+                    "last_id": last_id,
+                    "limit": chunk_size,
+                },
+            )
+        else:
+            cr.execute(
+                "SELECT id FROM project_task WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, chunk_size),
+            )
+            task_ids = [row[0] for row in cr.fetchall()]
+            if not task_ids:
+                break
+            codes = env["ir.sequence"].next_batch_by_code(
+                "project.task", len(task_ids)
+            )
+            cr.execute(
+                """
+                UPDATE project_task
+                SET code = x.code,
+                  display_code_name = '[' || x.code || '] ' || project_task.name
+                FROM unnest(%s, %s::varchar[]) AS x(id, code)
+                WHERE project_task.id = x.id
+                RETURNING project_task.id;
+                """,
+                (task_ids, codes),
+            )
+        task_ids = [row[0] for row in cr.fetchall()]
+        if not task_ids:
+            break
+        last_id = max(task_ids)
+        done += len(task_ids)
+        _logger.info("Task codes assigned: %s/%s", done, total)
+    env["project.task"].invalidate_cache(["code", "display_code_name"])
@@ -0,0 +1,48 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class IrSequence(models.Model):
+    _inherit = "ir.sequence"
+
+    @api.model
+    def next_batch_by_code(self, sequence_code, count):
+        """Draw ``count`` values of the sequence with the given code at once,
+        like ``next_by_code`` does for a single value.
+        """
+        self.check_access_rights("read")
+        company_id = self.env.context.get("force_company") or self.env.company.id
+        sequence = self.search(
+            [("code", "=", sequence_code), ("company_id", "in", [company_id, False])],
+            order="company_id",
+            limit=1,
+        )
+        if not sequence:
+            return [False] * count
+        return sequence._next_batch(count)
+
+    def _next_batch(self, count):
+        self.ensure_one()
+        if not count:
+            return []
+        if self.use_date_range:
+            return [self._next() for _i in range(count)]
+        cr = self.env.cr
+        if self.implementation == "standard":
+            cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ("ir_sequence_%03d" % self.id, count),
+            )
+            numbers = sorted(row[0] for row in cr.fetchall())
+        else:
+            increment = self.number_increment
+            cr.execute(
+                "UPDATE ir_sequence SET number_next = number_next + %s "
+                "WHERE id = %s RETURNING number_next",
+                (increment * count, self.id),
+            )
+            number_last = cr.fetchone()[0]
+            self.invalidate_cache(["number_next"], self.ids)
+            numbers = range(number_last - increment * count, number_last, increment)
+        return [self.get_next_char(number) for number in numbers]
@@ -2,22 +2,46 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 from odoo import _, api, fields, models
+from odoo.tools.sql import column_exists, create_column
 
 
 class ProjectTask(models.Model):
     _inherit = "project.task"
 
     code = fields.Char(string="Task Number", required=True, default="/", readonly=True)
+    display_code_name = fields.Char(
+        string="Number and Name", compute="_compute_display_code_name", store=True
+    )
 
     _sql_constraints = [
         ("project_task_unique_code", "UNIQUE (code)", _("The code must be unique!"))
     ]
 
+    def _auto_init(self):
+        # Fill the new column in SQL rather than recomputing every task
+        if not column_exists(self.env.cr, self._table, "display_code_name"):
+            create_column(self.env.cr, self._table, "display_code_name", "varchar")
+            self.env.cr.execute(
+                "UPDATE project_task SET display_code_name = "
+                "'[' || code || '] ' || name WHERE code IS NOT NULL"
+            )
+        return super()._auto_init()
+
+    @api.depends("code", "name")
+    def _compute_display_code_name(self):
+        for task in self:
+            task.display_code_name = "[{}] {}".format(task.code, task.name)
+
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get("code", "/") == "/":
-                vals["code"] = self.env["ir.sequence"].next_by_code("project.task")
+        new_code_vals_list = [
+            vals for vals in vals_list if vals.get("code", "/") == "/"
+        ]
+        codes = self.env["ir.sequence"].next_batch_by_code(
+            "project.task", len(new_code_vals_list)
+        )
+        for vals, code in zip(new_code_vals_list, codes):
+            vals["code"] = code
         return super().create(vals_list)
 
     def copy(self, default=None):
@@ -28,11 +52,9 @@ class ProjectTask(models.Model):
         return super().copy(default)
 
     def name_get(self):
-        result = super().name_get()
-        new_result = []
-
-        for task in result:
-            rec = self.browse(task[0])
-            name = "[{}] {}".format(rec.code, task[1])
-            new_result.append((rec.id, name))
-        return new_result
+        # Iterating over self reads the codes of all tasks in one query
+        codes = {task.id: task.code for task in self}
+        return [
+            (task_id, "[{}] {}".format(codes[task_id], name))
+            for task_id, name in super().name_get()
+        ]
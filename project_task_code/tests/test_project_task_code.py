@@ -3,6 +3,8 @@
 
 import odoo.tests.common as common
 
+from ..hooks import assign_task_codes
+
 
 class TestProjectTaskCode(common.TransactionCase):
     def setUp(self):
@@ -37,3 +39,62 @@ class TestProjectTaskCode(common.TransactionCase):
         project_task = self.project_task_model.create({"name": "Task Testing Get Name"})
         result = project_task.name_get()
         self.assertEqual(result[0][1], "[%s] Task Testing Get Name" % code)
+
+    def test_create_multi_task_code_assign(self):
+        number_next = self.task_sequence.number_next_actual
+        codes = [self.task_sequence.get_next_char(number_next + i) for i in range(3)]
+        project_tasks = self.project_task_model.create(
+            [{"name": "Batch task %s" % i} for i in range(3)]
+        )
+        self.assertEqual(project_tasks.mapped("code"), codes)
+        next_code = self.task_sequence.get_next_char(number_next + 3)
+        project_task = self.project_task_model.create({"name": "Next task"})
+        self.assertEqual(project_task.code, next_code)
+
+    def test_create_multi_task_code_no_gap(self):
+        self.task_sequence.implementation = "no_gap"
+        number_next = self.task_sequence.number_next_actual
+        project_tasks = self.project_task_model.create(
+            [{"name": "Batch task %s" % i} for i in range(2)]
+        )
+        self.assertEqual(
+            project_tasks.mapped("code"),
+            [self.task_sequence.get_next_char(number_next + i) for i in range(2)],
+        )
+        self.assertEqual(self.task_sequence.number_next_actual, number_next + 2)
+
+    def test_assign_task_codes(self):
+        number_next = self.task_sequence.number_next_actual
+        assign_task_codes(self.env, chunk_size=2)
+        project_tasks = self.project_task_model.with_context(active_test=False).search(
+            [], order="id"
+        )
+        self.assertEqual(
+            project_tasks.mapped("code"),
+            [
+                self.task_sequence.get_next_char(number_next + i)
+                for i in range(len(project_tasks))
+            ],
+        )
+        project_task = self.project_task_model.create({"name": "Next task"})
+        self.assertEqual(
+            project_task.code,
+            self.task_sequence.get_next_char(number_next + len(project_tasks)),
+        )
+
+    def test_display_code_name(self):
+        project_task = self.project_task_model.create({"name": "Task Code Name"})
+        self.assertEqual(
+            project_task.display_code_name, "[%s] Task Code Name" % project_task.code
+        )
+        project_task.name = "Renamed"
+        self.assertEqual(
+            project_task.display_code_name, "[%s] Renamed" % project_task.code
+        )
+
+    def test_name_get_multi(self):
+        project_tasks = self.project_task_model.search([], limit=10)
+        self.assertEqual(
+            [name for _task_id, name in project_tasks.name_get()],
+            ["[{}] {}".format(task.code, task.name) for task in project_tasks],
+        )
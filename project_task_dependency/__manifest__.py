@@ -11,7 +11,12 @@
     "author": "Onestein,Odoo Community Association (OCA)",
     "license": "AGPL-3",
     "depends": ["project"],
-    "data": ["views/project_task_view.xml"],
+    "data": [
+        "data/ir_cron.xml",
+        "views/project_task_view.xml",
+        "views/project_project_view.xml",
+        "views/res_config_settings_views.xml",
+    ],
     "installable": True,
     "auto_install": False,
 }
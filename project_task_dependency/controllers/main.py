@@ -0,0 +1,163 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+
+import werkzeug
+
+import odoo
+from odoo import http
+
+PAGE_SIZE = 1000
+# Rows fetched at a time from the server-side cursors of exports
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "dot": "text/vnd.graphviz",
+}
+
+
+class TaskDependencyController(http.Controller):
+    @http.route(
+        ["/project_task_dependency/levels"],
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def dependency_levels(self, project_id=None, **kw):
+        """Stream the tasks in dependency order as NDJSON, one line per page
+        of at most PAGE_SIZE task ids of a same level, levels in order.
+        """
+        env = http.request.env()
+
+        levels = env["project.task"].get_dependency_levels(
+            self._get_project_domain(project_id)
+        )
+        return werkzeug.wrappers.Response(
+            self._stream_levels(levels),
+            content_type=EXPORT_CONTENT_TYPES["ndjson"],
+            direct_passthrough=True,
+        )
+
+    def _stream_levels(self, levels):
+        for level, task_ids in enumerate(levels):
+            for index in range(0, len(task_ids), PAGE_SIZE):
+                page = {"level": level, "task_ids": task_ids[index : index + PAGE_SIZE]}
+                yield (json.dumps(page) + "\n").encode()
+
+    def _get_project_domain(self, project_id):
+        if not project_id:
+            return []
+        try:
+            return [("project_id", "=", int(project_id))]
+        except ValueError:
+            raise werkzeug.exceptions.BadRequest()
+
+    @http.route(
+        ["/project_task_dependency/export"],
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def export_graph(self, project_id=None, output="ndjson", **kw):
+        """Stream the tasks readable by the user and the dependencies between
+        them, as NDJSON lines or as a Graphviz DOT graph.
+        """
+        env = http.request.env()
+
+        if output not in EXPORT_CONTENT_TYPES:
+            raise werkzeug.exceptions.BadRequest()
+        queries = self._get_export_queries(env, self._get_project_domain(project_id))
+        # The request cursor is closed once the response is returned
+        lines = self._stream_export(env.cr.dbname, queries, output)
+        return werkzeug.wrappers.Response(
+            lines,
+            content_type=EXPORT_CONTENT_TYPES[output],
+            headers=[
+                (
+                    "Content-Disposition",
+                    "attachment; filename=dependencies.{}".format(output),
+                )
+            ],
+            direct_passthrough=True,
+        )
+
+    def _get_export_queries(self, env, domain):
+        """Return the queries and parameters of the exported tasks and of the
+        dependencies between them, restricted by access rules.
+        """
+        Task = env["project.task"]
+        Task.check_access_rights("read")
+        Task.flush(["name", "project_id", "stage_id", "dependency_task_ids"])
+        query = Task._where_calc(domain)
+        Task._apply_ir_rules(query, "read")
+        from_clause, where_clause, params = query.get_sql()
+        where_clause = where_clause or "TRUE"
+        tasks_query = "SELECT project_task.id FROM {} WHERE {}".format(
+            from_clause, where_clause
+        )
+        nodes_query = (
+            "SELECT project_task.id, project_task.name, project_task.project_id, "
+            "project_task.stage_id FROM {} WHERE {} ORDER BY project_task.id"
+        ).format(from_clause, where_clause)
+        edges_query = (
+            "SELECT task_id, dependency_task_id "
+            "FROM project_task_dependency_task_rel "
+            "WHERE task_id IN ({0}) AND dependency_task_id IN ({0})"
+        ).format(tasks_query)
+        return (nodes_query, params), (edges_query, params + params)
+
+    def _stream_export(self, dbname, queries, output):
+        # Passed through to the WSGI server as is, so chunks must be bytes
+        with odoo.registry(dbname).cursor() as cr:
+            for line in self._iter_export_lines(cr, queries, output):
+                yield line.encode()
+
+    def _iter_export_lines(self, cr, queries, output):
+        (nodes_query, nodes_params), (edges_query, edges_params) = queries
+        nodes = self._fetch_chunks(cr, nodes_query, nodes_params)
+        edges = self._fetch_chunks(cr, edges_query, edges_params)
+        if output == "dot":
+            yield "digraph dependencies {\n"
+            for task_id, name, _project_id, _stage_id in nodes:
+                yield "  {} [label={}];\n".format(
+                    task_id, json.dumps(name, ensure_ascii=False)
+                )
+            for task_id, dependency_task_id in edges:
+                yield "  {} -> {};\n".format(dependency_task_id, task_id)
+            yield "}\n"
+            return
+        for task_id, name, project_id, stage_id in nodes:
+            node = {
+                "type": "task",
+                "id": task_id,
+                "name": name,
+                "project_id": project_id,
+                "stage_id": stage_id,
+            }
+            yield json.dumps(node) + "\n"
+        for task_id, dependency_task_id in edges:
+            edge = {
+                "type": "dependency",
+                "task_id": task_id,
+                "dependency_task_id": dependency_task_id,
+            }
+            yield json.dumps(edge) + "\n"
+
+    def _fetch_chunks(self, cr, query, params):
+        """Iterate over the rows of the query through a server-side cursor,
+        holding only one chunk of rows in memory at a time.
+        """
+        cr.execute(
+            "DECLARE project_task_dependency_export NO SCROLL CURSOR FOR " + query,
+            params,
+        )
+        while True:
+            cr.execute(
+                "FETCH FORWARD %s FROM project_task_dependency_export",
+                (EXPORT_CHUNK_SIZE,),
+            )
+            rows = cr.fetchall()
+            if not rows:
+                break
+            yield from rows
+        cr.execute("CLOSE project_task_dependency_export")
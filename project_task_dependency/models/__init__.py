@@ -2,4 +2,5 @@
 
 from . import project_project
 from . import project_task
-from . import project_task_copy_map
+from . import project_task_type
+from . import res_config_settings
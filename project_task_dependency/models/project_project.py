@@ -2,7 +2,7 @@
 # Copyright 2020 Tecnativa - Manuel Calero
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models
+from odoo import api, models
 
 
 class ProjectProject(models.Model):
@@ -10,18 +10,28 @@ class ProjectProject(models.Model):
 
     def copy(self, default=None):
         self.ensure_one()
-        res = super(ProjectProject, self.with_context(project_copy=True)).copy(default)
+        # Filled with old task id: new task id by the copy of each task
+        task_map = {}
+        res = super(
+            ProjectProject, self.with_context(project_task_copy_map=task_map)
+        ).copy(default)
+        self.env["project.task"]._remap_copied_dependencies(task_map)
+        return res
+
+    def action_compute_critical_path(self):
+        self.env["project.task"]._compute_critical_path(self.ids)
+        return True
 
-        mappings = self.env["project.task.copy.map"].search(
-            [("new_task_id.project_id", "=", res.id)]
+    @api.model
+    def _cron_compute_critical_path(self):
+        self.env["project.task"].flush(["dependency_task_ids", "project_id"])
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT task.project_id
+            FROM project_task_dependency_task_rel rel
+            JOIN project_task task ON task.id = rel.task_id
+            WHERE task.project_id IS NOT NULL
+            """
         )
-        for task in res.tasks:
-            mapping = mappings.filtered(lambda t: t.new_task_id.id == task.id)
-            new_dependencies = []
-            for dep in mapping.old_task_id.dependency_task_ids:
-                dep_mapping = mappings.filtered(lambda t: t.old_task_id.id == dep.id)
-                new_dependencies.append(
-                    dep_mapping and dep_mapping.new_task_id.id or dep.id
-                )
-            task.write({"dependency_task_ids": [(6, 0, new_dependencies)]})
-        return res
+        project_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.browse(project_ids).action_compute_critical_path()
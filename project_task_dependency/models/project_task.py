@@ -2,8 +2,12 @@
 # Copyright 2020 Tecnativa - Manuel Calero
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import _, api, fields, models
+from collections import defaultdict, deque
+
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import ValidationError
+from odoo.osv import expression
+from odoo.tools import column_exists, create_column, float_is_zero
 
 
 class ProjectTask(models.Model):
@@ -21,13 +25,17 @@ class ProjectTask(models.Model):
         string="Recursive Dependencies",
         comodel_name="project.task",
         compute="_compute_recursive_dependency_task_ids",
+        search="_search_recursive_dependency_task_ids",
     )
 
     depending_task_ids = fields.Many2many(
         string="Depending Tasks",
         comodel_name="project.task",
+        relation="project_task_dependency_task_rel",
+        column1="dependency_task_id",
+        column2="task_id",
+        copy=False,
         help="Tasks that are dependent on this task.",
-        compute="_compute_depending_task_ids",
     )
 
     recursive_depending_task_ids = fields.Many2many(
@@ -35,55 +43,850 @@ class ProjectTask(models.Model):
         comodel_name="project.task",
         help="Tasks that are dependent on this task (recursive).",
         compute="_compute_recursive_depending_task_ids",
+        search="_search_recursive_depending_task_ids",
     )
 
-    @api.depends("dependency_task_ids")
-    def _compute_recursive_dependency_task_ids(self):
-        for task in self:
-            task.recursive_dependency_task_ids = task.get_dependency_tasks()
+    earliest_start = fields.Float(
+        readonly=True,
+        copy=False,
+        help="Earliest start of the task, in hours from the start of the "
+        "project, according to the planned hours of its dependencies.",
+    )
+    latest_start = fields.Float(
+        readonly=True,
+        copy=False,
+        help="Latest start of the task, in hours from the start of the project, "
+        "not delaying the end of the project.",
+    )
+    total_slack = fields.Float(
+        string="Slack",
+        readonly=True,
+        copy=False,
+        help="Hours the start of the task can be delayed without delaying the "
+        "end of the project.",
+    )
+    is_critical = fields.Boolean(
+        string="Critical",
+        readonly=True,
+        copy=False,
+        help="The task is on the critical path of its project.",
+    )
+
+    open_dependency_count = fields.Integer(
+        string="Open Dependencies",
+        readonly=True,
+        copy=False,
+        help="Number of dependencies of the task not in a folded stage.",
+    )
+    is_blocked = fields.Boolean(
+        string="Blocked",
+        readonly=True,
+        copy=False,
+        index=True,
+        help="Some dependencies of the task are not in a folded stage yet.",
+    )
+
+    def _auto_init(self):
+        # Only tasks having dependencies are filled, the others keep a null
+        # count, read as 0
+        fill = not column_exists(self.env.cr, self._table, "open_dependency_count")
+        if fill:
+            create_column(self.env.cr, self._table, "open_dependency_count", "int4")
+            create_column(self.env.cr, self._table, "is_blocked", "bool")
+        res = super()._auto_init()
+        if fill:
+            self.env.cr.execute(
+                "SELECT DISTINCT task_id FROM project_task_dependency_task_rel"
+            )
+            self._refresh_open_dependency_count(
+                task_ids=[row[0] for row in self.env.cr.fetchall()]
+            )
+        return res
+
+    def init(self):
+        # Materialized transitive closure of the dependencies, only kept up to
+        # date while enabled in the settings: one row per task and recursive
+        # dependency, with the length of the shortest path between them.
+        self.env.cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS project_task_dependency_closure (
+                task_id INTEGER NOT NULL
+                    REFERENCES project_task(id) ON DELETE CASCADE,
+                dependency_task_id INTEGER NOT NULL
+                    REFERENCES project_task(id) ON DELETE CASCADE,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (task_id, dependency_task_id)
+            );
+            CREATE INDEX IF NOT EXISTS project_task_dependency_closure_dependency_idx
+                ON project_task_dependency_closure (dependency_task_id);
+            """
+        )
+        tools.create_index(
+            self.env.cr,
+            "project_task_dependency_task_rel_dependency_task_id_idx",
+            "project_task_dependency_task_rel",
+            ["dependency_task_id"],
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        tasks = super().create(vals_list)
+        dependency_tasks = self.browse(
+            task.id
+            for task, vals in zip(tasks, vals_list)
+            if vals.get("dependency_task_ids")
+        )
+        depending_tasks = self.browse(
+            task.id
+            for task, vals in zip(tasks, vals_list)
+            if vals.get("depending_task_ids")
+        )
+        # Only edges to depending tasks can close a cycle through a new task
+        new_edges = depending_tasks._get_dependency_edges(depending=True)
+        self._check_dependency_cycles(new_edges)
+        new_edges |= dependency_tasks._get_dependency_edges()
+        task_ids = {edge[0] for edge in new_edges}
+        self._update_dependency_closure(added_edges=new_edges)
+        self._refresh_open_dependency_count(task_ids=list(task_ids))
+        return tasks
+
+    def write(self, vals):
+        edges_changed = "dependency_task_ids" in vals or "depending_task_ids" in vals
+        state_changed = "stage_id" in vals or "active" in vals
+        old_edges = self._get_written_edges(vals)
+        res = super().write(vals)
+        task_ids = []
+        if edges_changed:
+            new_edges = self._get_written_edges(vals)
+            self._check_dependency_cycles(new_edges - old_edges)
+            # Tasks whose dependencies changed
+            task_ids = list({edge[0] for edge in new_edges ^ old_edges})
+            self._update_dependency_closure(
+                added_edges=new_edges - old_edges, removed_edges=old_edges - new_edges
+            )
+        if task_ids or state_changed:
+            self._refresh_open_dependency_count(
+                task_ids=task_ids, dependency_ids=self.ids if state_changed else ()
+            )
+        return res
+
+    @api.model
+    def update_dependencies(self, to_add=(), to_remove=()):
+        """Add and remove dependencies between tasks in bulk, with one query
+        each and a single cycle check, e.g. to import a plan.
+
+        :param to_add: (task id, dependency task id) pairs to add
+        :param to_remove: (task id, dependency task id) pairs to remove
+        :return: True
+        """
+        to_add = [(int(task_id), int(dep_id)) for task_id, dep_id in to_add]
+        to_remove = [(int(task_id), int(dep_id)) for task_id, dep_id in to_remove]
+        tasks = self.browse({edge[0] for edge in to_add + to_remove})
+        tasks.check_access_rights("write")
+        tasks.check_access_rule("write")
+        self.flush(["dependency_task_ids", "depending_task_ids"])
+        cr = self.env.cr
+        removed_edges = set()
+        new_edges = set()
+        if to_remove:
+            cr.execute(
+                """
+                DELETE FROM project_task_dependency_task_rel rel
+                USING unnest(%s::int[], %s::int[])
+                    AS edge(task_id, dependency_task_id)
+                WHERE rel.task_id = edge.task_id
+                  AND rel.dependency_task_id = edge.dependency_task_id
+                RETURNING rel.task_id, rel.dependency_task_id
+                """,
+                ([edge[0] for edge in to_remove], [edge[1] for edge in to_remove]),
+            )
+            removed_edges = set(cr.fetchall())
+        if to_add:
+            cr.execute(
+                """
+                INSERT INTO project_task_dependency_task_rel
+                    (task_id, dependency_task_id)
+                SELECT DISTINCT task_id, dependency_task_id
+                FROM unnest(%s::int[], %s::int[])
+                    AS edge(task_id, dependency_task_id)
+                ON CONFLICT DO NOTHING
+                RETURNING task_id, dependency_task_id
+                """,
+                ([edge[0] for edge in to_add], [edge[1] for edge in to_add]),
+            )
+            new_edges = set(cr.fetchall())
+        changed_edges = removed_edges | new_edges
+        task_ids = list({edge[0] for edge in changed_edges})
+        self._invalidate_dependency_cache(
+            set(task_ids).union(edge[1] for edge in changed_edges)
+        )
+        self._check_dependency_cycles(new_edges)
+        self._update_dependency_closure(
+            added_edges=new_edges, removed_edges=removed_edges
+        )
+        self._refresh_open_dependency_count(task_ids=task_ids)
+        return True
+
+    def _get_written_edges(self, vals):
+        """Return the dependency edges of the tasks the values can change."""
+        edges = set()
+        if "dependency_task_ids" in vals:
+            edges |= self._get_dependency_edges()
+        if "depending_task_ids" in vals:
+            edges |= self._get_dependency_edges(depending=True)
+        return edges
+
+    def unlink(self):
+        depending_ids = set().union(*self._get_depending_tasks(self.ids).values())
+        closure_depending_ids = set()
+        if self._dependency_closure_enabled():
+            closure = self._get_dependency_closure(self.ids, depending=True)
+            closure_depending_ids = set().union(*closure.values())
+        res = super().unlink()
+        # Rows of the deleted tasks are deleted in cascade
+        self._rebuild_dependency_closure(list(closure_depending_ids - set(self.ids)))
+        self._refresh_open_dependency_count(
+            task_ids=list(depending_ids - set(self.ids))
+        )
+        return res
 
     @api.depends("dependency_task_ids")
-    def _compute_depending_task_ids(self):
+    def _compute_recursive_dependency_task_ids(self):
+        # Direct dependencies come from the cache, so that pending changes
+        # are taken into account, recursive ones from the database.
+        dependency_ids = self.mapped("dependency_task_ids")._origin.ids
+        closure = self._get_dependency_closure(dependency_ids)
         for task in self:
-            task.depending_task_ids = task.get_depending_tasks(task)
+            recursive_ids = set(task.dependency_task_ids._origin.ids)
+            for dependency_id in task.dependency_task_ids._origin.ids:
+                recursive_ids.update(closure.get(dependency_id, ()))
+            task.recursive_dependency_task_ids = [(6, 0, list(recursive_ids))]
 
-    @api.depends("dependency_task_ids")
+    @api.depends("dependency_task_ids", "depending_task_ids")
     def _compute_recursive_depending_task_ids(self):
+        closure = self._get_dependency_closure(self._origin.ids, depending=True)
         for task in self:
-            task.recursive_depending_task_ids = task.get_depending_tasks(task, True)
+            task.recursive_depending_task_ids = [
+                (6, 0, list(closure.get(task._origin.id, ())))
+            ]
+
+    def _search_recursive_dependency_task_ids(self, operator, value):
+        return self._search_dependency_closure(operator, value, depending=True)
+
+    def _search_recursive_depending_task_ids(self, operator, value):
+        return self._search_dependency_closure(operator, value, depending=False)
+
+    @api.model
+    def _search_dependency_closure(self, operator, value, depending):
+        """Search tasks through the recursive dependencies of other tasks.
+
+        :param depending: search the tasks depending on the given ones if set,
+            otherwise the tasks the given ones depend on
+        """
+        result, other = "dependency_task_id", "task_id"
+        if depending:
+            result, other = other, result
+        negative = operator in expression.NEGATIVE_TERM_OPERATORS
+        if not value:
+            self.flush(["dependency_task_ids"])
+            query = "SELECT {} FROM project_task_dependency_task_rel".format(result)
+            return [("id", "inselect" if negative else "not inselect", (query, []))]
+
+        if isinstance(value, str):
+            task_ids = self._search([("name", "ilike", value)])
+        elif isinstance(value, int):
+            task_ids = [value]
+        else:
+            task_ids = list(value)
+        if not task_ids:
+            return expression.TRUE_DOMAIN if negative else expression.FALSE_DOMAIN
+
+        if self._dependency_closure_enabled():
+            query = (
+                "SELECT {} FROM project_task_dependency_closure "
+                "WHERE {} IN %s".format(result, other)
+            )
+            return [
+                (
+                    "id",
+                    "not inselect" if negative else "inselect",
+                    (query, [tuple(task_ids)]),
+                )
+            ]
+        closure = self._get_dependency_closure(task_ids, depending=depending)
+        closure_ids = list(set().union(*closure.values()))
+        return [("id", "not in" if negative else "in", closure_ids)]
 
     def get_dependency_tasks(self):
         self.ensure_one()
-        dependency_tasks = self.dependency_task_ids
-        tasks_stack = dependency_tasks
-        processed_tasks = self.env["project.task"]
-        while tasks_stack:
-            actual_task = fields.first(tasks_stack)
-            processed_tasks |= actual_task
-            dependency_tasks |= actual_task.dependency_task_ids
-            tasks_stack = dependency_tasks - processed_tasks
-        return dependency_tasks
+        return self.recursive_dependency_task_ids
+
+    @api.model
+    def _get_depending_tasks(self, task_ids):
+        """Return the tasks directly depending on the given tasks.
+
+        :param task_ids: ids of the tasks
+        :return: dictionary mapping each given task id having depending tasks
+            to the list of their ids
+        """
+        if not task_ids:
+            return {}
+        self.flush(["dependency_task_ids"])
+        self.env.cr.execute(
+            """
+            SELECT dependency_task_id, array_agg(task_id)
+            FROM project_task_dependency_task_rel
+            WHERE dependency_task_id IN %s
+            GROUP BY dependency_task_id
+            """,
+            (tuple(task_ids),),
+        )
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_dependency_closure(self, task_ids, depending=False):
+        """Return the tasks the given tasks depend on, directly or not.
+
+        :param task_ids: ids of the starting tasks
+        :param depending: follow dependencies the other way round, returning
+            the tasks depending on the given tasks instead
+        :return: dictionary mapping each starting task id having dependencies
+            to the set of ids of its recursive dependencies
+        """
+        if not task_ids:
+            return {}
+        source, target = "task_id", "dependency_task_id"
+        if depending:
+            source, target = target, source
+        self.flush(["dependency_task_ids"])
+        if self._dependency_closure_enabled():
+            self.env.cr.execute(
+                """
+                SELECT {source}, array_agg({target})
+                FROM project_task_dependency_closure
+                WHERE {source} IN %s
+                GROUP BY {source}
+                """.format(
+                    source=source, target=target
+                ),
+                (tuple(task_ids),),
+            )
+            return {
+                task_id: set(dependency_ids)
+                for task_id, dependency_ids in self.env.cr.fetchall()
+            }
+        # UNION discards paths already seen, which also stops on cycles
+        self.env.cr.execute(
+            """
+            WITH RECURSIVE closure(source_id, target_id) AS (
+                SELECT {source}, {target}
+                FROM project_task_dependency_task_rel
+                WHERE {source} IN %s
+              UNION
+                SELECT closure.source_id, rel.{target}
+                FROM closure
+                JOIN project_task_dependency_task_rel rel
+                  ON rel.{source} = closure.target_id
+            )
+            SELECT source_id, array_agg(target_id)
+            FROM closure
+            GROUP BY source_id
+            """.format(
+                source=source, target=target
+            ),
+            (tuple(task_ids),),
+        )
+        return {
+            task_id: set(dependency_ids)
+            for task_id, dependency_ids in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _refresh_open_dependency_count(self, task_ids=(), dependency_ids=()):
+        """Count again the open dependencies of the given tasks and of the
+        tasks directly depending on the given dependencies, in one statement.
+        """
+        if not task_ids and not dependency_ids:
+            return
+        self.flush(["dependency_task_ids", "stage_id", "active"])
+        self.env["project.task.type"].flush(["fold"])
+        self.env.cr.execute(
+            """
+            WITH counts AS (
+                SELECT task.id, count(dependency.id) FILTER (
+                    WHERE dependency.active AND NOT COALESCE(stage.fold, FALSE)
+                ) AS open_count
+                FROM project_task task
+                LEFT JOIN project_task_dependency_task_rel rel
+                  ON rel.task_id = task.id
+                LEFT JOIN project_task dependency
+                  ON dependency.id = rel.dependency_task_id
+                LEFT JOIN project_task_type stage
+                  ON stage.id = dependency.stage_id
+                WHERE task.id = ANY(%(task_ids)s)
+                   OR task.id IN (
+                    SELECT task_id
+                    FROM project_task_dependency_task_rel
+                    WHERE dependency_task_id = ANY(%(dependency_ids)s)
+                )
+                GROUP BY task.id
+            )
+            UPDATE project_task task
+            SET open_dependency_count = counts.open_count,
+                is_blocked = counts.open_count > 0
+            FROM counts
+            WHERE task.id = counts.id
+              AND task.open_dependency_count IS DISTINCT FROM counts.open_count
+            RETURNING task.id
+            """,
+            {"task_ids": list(task_ids), "dependency_ids": list(dependency_ids)},
+        )
+        self.invalidate_cache(
+            ["open_dependency_count", "is_blocked"],
+            [row[0] for row in self.env.cr.fetchall()],
+        )
+
+    @api.model
+    def _dependency_closure_enabled(self):
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("project_task_dependency.closure_table")
+        )
+
+    @api.model
+    def _update_dependency_closure(self, added_edges=(), removed_edges=()):
+        """Update the materialized closure after (task, dependency) edges were
+        added or removed.
+
+        Removed edges rebuild the rows of their tasks and of the tasks
+        depending on them. Each added edge (a, b) then inserts, or shortens,
+        the rows between a and the tasks depending on it, and b and its
+        recursive dependencies.
+        """
+        if not (added_edges or removed_edges) or not self._dependency_closure_enabled():
+            return
+        self.flush(["dependency_task_ids"])
+        cr = self.env.cr
+        if removed_edges:
+            task_ids = {edge[0] for edge in removed_edges}
+            cr.execute(
+                """
+                SELECT DISTINCT task_id
+                FROM project_task_dependency_closure
+                WHERE dependency_task_id IN %s
+                """,
+                (tuple(task_ids),),
+            )
+            task_ids.update(row[0] for row in cr.fetchall())
+            self._rebuild_dependency_closure(list(task_ids))
+        # One edge at a time, so that paths through several new edges are
+        # found from the rows inserted for the previous ones
+        for task_id, dependency_id in added_edges:
+            cr.execute(
+                """
+                INSERT INTO project_task_dependency_closure AS closure
+                    (task_id, dependency_task_id, depth)
+                SELECT task.id, dependency.id, task.depth + 1 + dependency.depth
+                FROM (
+                    SELECT %(task_id)s AS id, 0 AS depth
+                  UNION ALL
+                    SELECT task_id, depth
+                    FROM project_task_dependency_closure
+                    WHERE dependency_task_id = %(task_id)s
+                ) AS task
+                CROSS JOIN (
+                    SELECT %(dependency_id)s AS id, 0 AS depth
+                  UNION ALL
+                    SELECT dependency_task_id, depth
+                    FROM project_task_dependency_closure
+                    WHERE task_id = %(dependency_id)s
+                ) AS dependency
+                ON CONFLICT (task_id, dependency_task_id) DO UPDATE
+                SET depth = LEAST(closure.depth, EXCLUDED.depth)
+                WHERE EXCLUDED.depth < closure.depth
+                """,
+                {"task_id": task_id, "dependency_id": dependency_id},
+            )
+
+    @api.model
+    def _rebuild_dependency_closure(self, task_ids=None):
+        """Compute again the closure rows of the given tasks, or of all tasks."""
+        if task_ids is not None and not task_ids:
+            return
+        self.flush(["dependency_task_ids"])
+        if task_ids is None:
+            self.env.cr.execute("DELETE FROM project_task_dependency_closure")
+        else:
+            self.env.cr.execute(
+                "DELETE FROM project_task_dependency_closure WHERE task_id IN %s",
+                (tuple(task_ids),),
+            )
+        self._insert_dependency_closure(task_ids)
+
+    @api.model
+    def _insert_dependency_closure(self, task_ids=None):
+        """Insert closure rows of the given tasks, or of all tasks, one depth at
+        a time so that only the shortest path between two tasks is kept.
+        """
+        cr = self.env.cr
+        task_filter = "TRUE"
+        params = {"depth": 1}
+        if task_ids is not None:
+            task_filter = "closure.task_id = ANY(%(task_ids)s)"
+            params["task_ids"] = list(task_ids)
+        cr.execute(
+            """
+            INSERT INTO project_task_dependency_closure
+                (task_id, dependency_task_id, depth)
+            SELECT closure.task_id, closure.dependency_task_id, 1
+            FROM project_task_dependency_task_rel closure
+            WHERE {}
+            ON CONFLICT DO NOTHING
+            """.format(
+                task_filter
+            ),
+            params,
+        )
+        while cr.rowcount:
+            cr.execute(
+                """
+                INSERT INTO project_task_dependency_closure
+                    (task_id, dependency_task_id, depth)
+                SELECT closure.task_id, rel.dependency_task_id, %(depth)s + 1
+                FROM project_task_dependency_closure closure
+                JOIN project_task_dependency_task_rel rel
+                  ON rel.task_id = closure.dependency_task_id
+                WHERE closure.depth = %(depth)s AND {}
+                ON CONFLICT DO NOTHING
+                """.format(
+                    task_filter
+                ),
+                params,
+            )
+            params["depth"] += 1
 
     @api.model
     def get_depending_tasks(self, task, recursive=False):
         if not isinstance(task.id, models.NewId):
-            depending_tasks = self.search([("dependency_task_ids", "in", task.id)])
             if recursive:
-                for t in depending_tasks:
-                    depending_tasks += self.get_depending_tasks(t, recursive)
-            return depending_tasks
+                return task.recursive_depending_task_ids
+            return task.depending_task_ids
+
+    def _get_dependency_edges(self, depending=False):
+        """Return the (task, dependency) id pairs of the current tasks.
+
+        :param depending: return the edges of the tasks depending on the
+            current tasks instead
+        """
+        if not self.ids:
+            return set()
+        self.flush(["dependency_task_ids", "depending_task_ids"])
+        self.env.cr.execute(
+            """
+            SELECT task_id, dependency_task_id
+            FROM project_task_dependency_task_rel
+            WHERE {} IN %s
+            """.format(
+                "dependency_task_id" if depending else "task_id"
+            ),
+            (tuple(self.ids),),
+        )
+        return set(self.env.cr.fetchall())
 
-    @api.constrains("dependency_task_ids")
-    def _check_dependency_recursion(self):
-        if not self._check_m2m_recursion("dependency_task_ids"):
-            raise ValidationError(
-                _("You cannot create recursive dependencies between tasks.")
+    @api.model
+    def _check_dependency_cycles(self, edges):
+        """Check that the given new (task, dependency) edges do not close a
+        cycle, that is the task is not reachable from its new dependency.
+        One query per distinct dependency walks the graph reachable from it,
+        and stops as soon as one of its new depending tasks is reached.
+        """
+        self.flush(["dependency_task_ids"])
+        task_ids_by_dependency = {}
+        for task_id, dependency_id in edges:
+            task_ids_by_dependency.setdefault(dependency_id, set()).add(task_id)
+        for dependency_id, task_ids in task_ids_by_dependency.items():
+            self.env.cr.execute(
+                """
+                WITH RECURSIVE reachable(id) AS (
+                    SELECT %s
+                  UNION
+                    SELECT rel.dependency_task_id
+                    FROM reachable
+                    JOIN project_task_dependency_task_rel rel
+                      ON rel.task_id = reachable.id
+                )
+                SELECT id FROM reachable WHERE id IN %s LIMIT 1
+                """,
+                (dependency_id, tuple(task_ids)),
             )
+            row = self.env.cr.fetchone()
+            if row:
+                path = self._get_dependency_path(
+                    self._get_reachable_edges(dependency_id), dependency_id, row[0]
+                )
+                raise ValidationError(
+                    _(
+                        "You cannot create recursive dependencies between tasks.\n"
+                        "%s"
+                    )
+                    % " -> ".join(
+                        self.browse([row[0]] + path).mapped("display_name")
+                    )
+                )
+
+    @api.model
+    def _get_reachable_edges(self, task_id):
+        """Return the (task, dependency) edges reachable from the given task."""
+        self.env.cr.execute(
+            """
+            WITH RECURSIVE reachable(task_id, dependency_task_id) AS (
+                SELECT NULL::integer, %s
+              UNION
+                SELECT rel.task_id, rel.dependency_task_id
+                FROM reachable
+                JOIN project_task_dependency_task_rel rel
+                  ON rel.task_id = reachable.dependency_task_id
+            )
+            SELECT task_id, dependency_task_id FROM reachable
+            """,
+            (task_id,),
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _get_dependency_path(self, edges, source_id, target_id):
+        """Return the ids of the tasks on a shortest path from the source to
+        the target task through the given (task, dependency) edges.
+        """
+        dependency_ids = {}
+        for task_id, dependency_id in edges:
+            dependency_ids.setdefault(task_id, []).append(dependency_id)
+        previous = {source_id: None}
+        queue = deque([source_id])
+        while queue and target_id not in previous:
+            task_id = queue.popleft()
+            for dependency_id in dependency_ids.get(task_id, ()):
+                if dependency_id not in previous:
+                    previous[dependency_id] = task_id
+                    queue.append(dependency_id)
+        path = [target_id]
+        while path[-1] != source_id:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    @api.model
+    def get_dependency_levels(self, domain=None):
+        """Return the tasks matching the domain in dependency order, grouped
+        in levels: tasks of a level only depend on tasks of previous levels,
+        so the tasks of a same level can be processed in parallel.
+        Dependencies on tasks not matching the domain are ignored.
+
+        :param domain: domain of the tasks to order
+        :return: list of levels, each one being a sorted list of task ids
+        """
+        task_ids = self._search(domain or [])
+        if not task_ids:
+            return []
+        self.flush(["dependency_task_ids"])
+        self.env.cr.execute(
+            """
+            SELECT task_id, dependency_task_id
+            FROM project_task_dependency_task_rel
+            WHERE task_id = ANY(%(task_ids)s)
+              AND dependency_task_id = ANY(%(task_ids)s)
+            """,
+            {"task_ids": task_ids},
+        )
+        return self._get_topological_levels(task_ids, self.env.cr.fetchall())
+
+    @api.model
+    def _get_topological_levels(self, task_ids, edges):
+        """Group the tasks in levels with Kahn's algorithm.
+
+        :param task_ids: ids of the tasks
+        :param edges: (task, dependency) id pairs between the given tasks
+        :return: list of levels, each one being a sorted list of task ids;
+            tasks on a cycle are left out
+        """
+        pending_count = dict.fromkeys(task_ids, 0)
+        dependents = defaultdict(list)
+        for task_id, dependency_id in edges:
+            pending_count[task_id] += 1
+            dependents[dependency_id].append(task_id)
+        level = sorted(task_id for task_id, count in pending_count.items() if not count)
+        levels = []
+        while level:
+            levels.append(level)
+            next_level = []
+            for task_id in level:
+                for dependent_id in dependents[task_id]:
+                    pending_count[dependent_id] -= 1
+                    if not pending_count[dependent_id]:
+                        next_level.append(dependent_id)
+            level = sorted(next_level)
+        return levels
+
+    @api.model
+    def _compute_critical_path(self, project_ids):
+        """Compute the critical path of the given projects, from the planned
+        hours of their tasks and the dependencies between tasks of the same
+        project, and store the schedule of every task.
+        """
+        if not project_ids:
+            return
+        self.flush(["dependency_task_ids", "planned_hours", "project_id", "active"])
+        cr = self.env.cr
+        cr.execute(
+            """
+            SELECT task.id, task.project_id, COALESCE(task.planned_hours, 0),
+                array_remove(array_agg(dependency.id), NULL)
+            FROM project_task task
+            LEFT JOIN project_task_dependency_task_rel rel
+              ON rel.task_id = task.id
+            LEFT JOIN project_task dependency
+              ON dependency.id = rel.dependency_task_id
+             AND dependency.project_id = task.project_id
+             AND dependency.active
+            WHERE task.project_id IN %s AND task.active
+            GROUP BY task.id
+            """,
+            (tuple(project_ids),),
+        )
+        durations = {}
+        project_by_task = {}
+        pending_count = {}
+        dependents = defaultdict(list)
+        for task_id, project_id, duration, dependency_ids in cr.fetchall():
+            durations[task_id] = duration
+            project_by_task[task_id] = project_id
+            pending_count[task_id] = len(dependency_ids)
+            for dependency_id in dependency_ids:
+                dependents[dependency_id].append(task_id)
+
+        # Forward pass, in topological order: tasks are appended to the order
+        # once all their dependencies have been scheduled. Tasks on a cycle
+        # are never reached and keep their previous schedule.
+        order = [task_id for task_id, count in pending_count.items() if not count]
+        earliest = dict.fromkeys(durations, 0.0)
+        project_end = defaultdict(float)
+        index = 0
+        while index < len(order):
+            task_id = order[index]
+            index += 1
+            finish = earliest[task_id] + durations[task_id]
+            project_id = project_by_task[task_id]
+            project_end[project_id] = max(project_end[project_id], finish)
+            for dependent_id in dependents[task_id]:
+                earliest[dependent_id] = max(earliest[dependent_id], finish)
+                pending_count[dependent_id] -= 1
+                if not pending_count[dependent_id]:
+                    order.append(dependent_id)
+        if not order:
+            return
+
+        # Backward pass, dependent tasks first. Dependents on or after a
+        # cycle are not scheduled and do not constrain their dependencies.
+        latest = {}
+        for task_id in reversed(order):
+            finish = min(
+                (
+                    latest[dependent_id]
+                    for dependent_id in dependents[task_id]
+                    if dependent_id in latest
+                ),
+                default=project_end[project_by_task[task_id]],
+            )
+            latest[task_id] = finish - durations[task_id]
+
+        cr.execute(
+            """
+            UPDATE project_task task
+            SET earliest_start = schedule.earliest_start,
+                latest_start = schedule.latest_start,
+                total_slack = schedule.latest_start - schedule.earliest_start,
+                is_critical = schedule.is_critical
+            FROM unnest(%s::int[], %s::float8[], %s::float8[], %s::bool[])
+                AS schedule(id, earliest_start, latest_start, is_critical)
+            WHERE task.id = schedule.id
+              AND (
+                task.earliest_start IS DISTINCT FROM schedule.earliest_start
+                OR task.latest_start IS DISTINCT FROM schedule.latest_start
+                OR task.is_critical IS DISTINCT FROM schedule.is_critical
+              )
+            RETURNING task.id
+            """,
+            (
+                order,
+                [earliest[task_id] for task_id in order],
+                [latest[task_id] for task_id in order],
+                [
+                    float_is_zero(
+                        latest[task_id] - earliest[task_id], precision_digits=5
+                    )
+                    for task_id in order
+                ],
+            ),
+        )
+        self.invalidate_cache(
+            ["earliest_start", "latest_start", "total_slack", "is_critical"],
+            [row[0] for row in cr.fetchall()],
+        )
 
     def copy(self, default=None):
         res = super(ProjectTask, self).copy(default)
-        if self.env.context.get("project_copy"):
-            self.env["project.task.copy.map"].create(
-                {"old_task_id": self.id, "new_task_id": res.id}
-            )
+        task_map = self.env.context.get("project_task_copy_map")
+        if task_map is not None:
+            task_map[self.id] = res.id
         return res
+
+    @api.model
+    def _remap_copied_dependencies(self, task_map):
+        """Make copied tasks depend on the copies of their dependencies,
+        when these were copied too.
+
+        :param task_map: dictionary mapping original task ids to copy ids
+        """
+        if not task_map:
+            return
+        self.flush(["dependency_task_ids"])
+        old_ids, new_ids = list(task_map), list(task_map.values())
+        self.env.cr.execute(
+            """
+            DELETE FROM project_task_dependency_task_rel
+            WHERE task_id = ANY(%(new_ids)s);
+            INSERT INTO project_task_dependency_task_rel
+                (task_id, dependency_task_id)
+            SELECT task_map.new_id,
+                COALESCE(dependency_map.new_id, rel.dependency_task_id)
+            FROM project_task_dependency_task_rel rel
+            JOIN unnest(%(old_ids)s, %(new_ids)s) AS task_map(old_id, new_id)
+              ON rel.task_id = task_map.old_id
+            LEFT JOIN unnest(%(old_ids)s, %(new_ids)s)
+                AS dependency_map(old_id, new_id)
+              ON rel.dependency_task_id = dependency_map.old_id
+            RETURNING dependency_task_id
+            """,
+            {"old_ids": old_ids, "new_ids": new_ids},
+        )
+        dependency_ids = {row[0] for row in self.env.cr.fetchall()}
+        self._invalidate_dependency_cache(set(new_ids) | dependency_ids)
+        if self._dependency_closure_enabled():
+            # Only copies can depend on copies
+            self._rebuild_dependency_closure(new_ids)
+        self._refresh_open_dependency_count(task_ids=new_ids)
+
+    @api.model
+    def _invalidate_dependency_cache(self, task_ids):
+        """Invalidate the cached dependencies of the given tasks, after their
+        dependencies, or the tasks depending on them, changed in SQL.
+        """
+        self.invalidate_cache(
+            [
+                "dependency_task_ids",
+                "recursive_dependency_task_ids",
+                "depending_task_ids",
+                "recursive_depending_task_ids",
+            ],
+            list(task_ids),
+        )
@@ -0,0 +1,21 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import models
+
+
+class ProjectTaskType(models.Model):
+    _inherit = "project.task.type"
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "fold" in vals:
+            # Tasks of the stages are now open or closed dependencies
+            task_ids = (
+                self.env["project.task"]
+                .with_context(active_test=False)
+                ._search([("stage_id", "in", self.ids)])
+            )
+            self.env["project.task"]._refresh_open_dependency_count(
+                dependency_ids=task_ids
+            )
+        return res
@@ -0,0 +1,20 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = "res.config.settings"
+
+    project_task_dependency_closure = fields.Boolean(
+        string="Materialized Task Dependencies",
+        config_parameter="project_task_dependency.closure_table",
+        help="Keep the recursive dependencies of every task in a table, so "
+        "that filtering on them does not walk the dependency graph.",
+    )
+
+    def set_values(self):
+        was_enabled = self.env["project.task"]._dependency_closure_enabled()
+        super().set_values()
+        if self.project_task_dependency_closure and not was_enabled:
+            self.env["project.task"]._rebuild_dependency_closure()
@@ -0,0 +1,243 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+import logging
+import os
+import random
+import time
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+# Graph sizes of the standard run, which only checks query counts, and of
+# the benchmark run
+QUERY_COUNT_SIZES = [1000]
+SIZES = [
+    int(size)
+    for size in os.environ.get(
+        "PROJECT_TASK_DEPENDENCY_BENCHMARK_SIZES", "1000,10000,100000"
+    ).split(",")
+]
+# Projects are copied through the ORM, task by task
+COPY_MAX_TASKS = int(
+    os.environ.get("PROJECT_TASK_DEPENDENCY_BENCHMARK_COPY_TASKS", 10000)
+)
+# Tracked query counts by graph shape and operation, the same for all sizes
+QUERY_COUNT_BASELINE = os.path.join(
+    os.path.dirname(__file__), "benchmark_baseline.json"
+)
+# JSON file of the results of a previous benchmark run on the same machine,
+# to compare wall times with, and file to write the results of this run to
+BASELINE = os.environ.get("PROJECT_TASK_DEPENDENCY_BENCHMARK_BASELINE")
+OUTPUT = os.environ.get("PROJECT_TASK_DEPENDENCY_BENCHMARK_OUTPUT")
+# Allowed slowdown factor against the wall times of the baseline
+TIME_TOLERANCE = float(
+    os.environ.get("PROJECT_TASK_DEPENDENCY_BENCHMARK_TIME_TOLERANCE", 2.0)
+)
+RANDOM_DEPENDENCIES = 3
+
+
+def chain_edges(count):
+    return [(i, i - 1) for i in range(1, count)]
+
+
+def fan_out_edges(count):
+    return [(i, 0) for i in range(1, count)]
+
+
+def diamond_edges(count):
+    # Diamonds of 4 tasks, the top of each one depending on the bottom of
+    # the previous one
+    edges = []
+    for i in range(1, count):
+        position = i % 4
+        if position in (1, 2):
+            edges.append((i, i - position))
+        elif position == 3:
+            edges.extend([(i, i - 1), (i, i - 2)])
+        else:
+            edges.append((i, i - 1))
+    return edges
+
+
+def random_dag_edges(count):
+    generator = random.Random(count)
+    edges = set()
+    for i in range(1, count):
+        for _i in range(min(i, RANDOM_DEPENDENCIES)):
+            edges.add((i, generator.randrange(i)))
+    return sorted(edges)
+
+
+class TestQueryCount(TransactionCase):
+    """Query counts of dependency graph operations on generated graphs,
+    checked against the tracked baseline.
+    """
+
+    sizes = QUERY_COUNT_SIZES
+    copy_max_tasks = 0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = {}
+        with open(QUERY_COUNT_BASELINE) as baseline_file:
+            cls.query_count_baseline = json.load(baseline_file)
+        cls.baseline = {}
+        if BASELINE:
+            with open(BASELINE) as baseline_file:
+                cls.baseline = json.load(baseline_file)
+
+    def setUp(self):
+        super().setUp()
+        self.Task = self.env["project.task"]
+
+    def _measure(self, shape, count, operation, func, *args):
+        """Run ``func`` and record its query count and wall time, failing on
+        a regression against the baselines.
+        """
+        self.env["base"].flush()
+        # Warm the cached setting, so that counts do not depend on prior tests
+        self.Task._dependency_closure_enabled()
+        sql_count = self.cr.sql_log_count
+        start = time.time()
+        func(*args)
+        self.env["base"].flush()
+        elapsed = time.time() - start
+        queries = self.cr.sql_log_count - sql_count
+
+        key = "{}/{}/{}".format(shape, count, operation)
+        _logger.info("%s: %s queries, %.3f s", key, queries, elapsed)
+        self.results[key] = {"queries": queries, "time": elapsed}
+        expected = self.query_count_baseline.get("{}/{}".format(shape, operation))
+        if expected:
+            self.assertLessEqual(
+                queries, expected["queries"], "%s: more queries than baseline" % key
+            )
+        if key in self.baseline:
+            self.assertLessEqual(
+                elapsed,
+                self.baseline[key]["time"] * TIME_TOLERANCE,
+                "%s: slower than baseline (%.3f s)" % (key, self.baseline[key]["time"]),
+            )
+
+    def _create_graph(self, name, count, edges):
+        """Create a project of ``count`` tasks in SQL, with dependencies
+        between the task indexes of the given edges.
+        """
+        project = self.env["project.project"].create({"name": name})
+        template = self.Task.create({"name": name, "project_id": project.id})
+        self.env["base"].flush()
+        self.cr.execute(
+            """
+            INSERT INTO project_task (
+              name, project_id, company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            )
+            SELECT name || ' ' || i, project_id, company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            FROM project_task, generate_series(1, %s) AS i
+            WHERE id = %s
+            ORDER BY i
+            RETURNING id
+            """,
+            (count, template.id),
+        )
+        task_ids = sorted(row[0] for row in self.cr.fetchall())
+        if edges:
+            self.cr.execute(
+                """
+                INSERT INTO project_task_dependency_task_rel
+                  (task_id, dependency_task_id)
+                SELECT task_id, dependency_task_id
+                FROM unnest(%s::int[], %s::int[]) AS x(task_id, dependency_task_id)
+                """,
+                (
+                    [task_ids[edge[0]] for edge in edges],
+                    [task_ids[edge[1]] for edge in edges],
+                ),
+            )
+        self.cr.execute("ANALYZE project_task_dependency_task_rel")
+        self.Task.invalidate_cache()
+        return project, task_ids
+
+    def _benchmark_graph(self, shape, edges_function):
+        for count in self.sizes:
+            name = "{}/{}".format(shape, count)
+            project, task_ids = self._create_graph(name, count, edges_function(count))
+            first_id, last_id = task_ids[0], task_ids[-1]
+
+            self._measure(
+                shape, count, "closure", self.Task._get_dependency_closure, [last_id]
+            )
+            self._measure(
+                shape, count, "depending", self.Task._get_depending_tasks, task_ids
+            )
+            self._measure(
+                shape,
+                count,
+                "recursive_depending",
+                self.Task._get_dependency_closure,
+                [first_id],
+                True,
+            )
+
+            # A new task depending on the last one walks all its dependencies
+            probe = self.Task.create({"name": name, "project_id": project.id})
+            self._measure(
+                shape,
+                count,
+                "cycle_check",
+                self.Task._check_dependency_cycles,
+                {(probe.id, last_id)},
+            )
+
+            # Dependencies of copied tasks, given copies made in SQL
+            __, copy_ids = self._create_graph(name + " copy", count, [])
+            self._measure(
+                shape,
+                count,
+                "copy_remap",
+                self.Task._remap_copied_dependencies,
+                dict(zip(task_ids, copy_ids)),
+            )
+
+            # Not in the tracked baseline: the count of the whole copy depends
+            # on the modules overriding copy or create
+            if count <= self.copy_max_tasks:
+                self._measure(shape, count, "copy", project.copy)
+
+    def test_chain(self):
+        self._benchmark_graph("chain", chain_edges)
+
+    def test_fan_out(self):
+        self._benchmark_graph("fan_out", fan_out_edges)
+
+    def test_diamond(self):
+        self._benchmark_graph("diamond", diamond_edges)
+
+    def test_random_dag(self):
+        self._benchmark_graph("random_dag", random_dag_edges)
+
+
+@tagged("-standard", "benchmark")
+class TestBenchmark(TestQueryCount):
+    """Dependency graph benchmarks on larger graphs, run with
+    ``--test-tags benchmark``, writing their results to the output file.
+    """
+
+    sizes = SIZES
+    copy_max_tasks = COPY_MAX_TASKS
+
+    @classmethod
+    def tearDownClass(cls):
+        if OUTPUT:
+            previous = {}
+            if os.path.exists(OUTPUT):
+                with open(OUTPUT) as output_file:
+                    previous = json.load(output_file)
+            previous.update(cls.results)
+            with open(OUTPUT, "w") as output_file:
+                json.dump(previous, output_file, indent=2, sort_keys=True)
+        super().tearDownClass()
@@ -1,9 +1,19 @@
 # Copyright 2016-2018 Onestein (<http://www.onestein.eu>)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import json
+from unittest import mock
+
+import werkzeug
+
+import odoo
+from odoo import http
 from odoo.exceptions import ValidationError
 from odoo.tests.common import TransactionCase
 
+from ..controllers import main
+from ..controllers.main import TaskDependencyController
+
 
 class TestProjectTaskDependency(TransactionCase):
     def setUp(self):
@@ -52,6 +62,22 @@ class TestProjectTaskDependency(TransactionCase):
         self.assertEqual(len(self.task3.recursive_depending_task_ids), 0)
         self.assertEqual(len(self.task1.recursive_depending_task_ids), 3)
 
+    def test_03_dependency_closure(self):
+        closure = self.env["project.task"]._get_dependency_closure(
+            [self.task1.id, self.task3.id, self.task4.id]
+        )
+        self.assertEqual(
+            closure,
+            {
+                self.task3.id: {self.task1.id, self.task2.id},
+                self.task4.id: {self.task1.id, self.task2.id},
+            },
+        )
+        tasks = self.task1 | self.task3 | self.task4
+        self.assertEqual(
+            tasks.mapped("recursive_dependency_task_ids"), self.task1 | self.task2
+        )
+
     def test_02_avoid_recursion(self):
         with self.assertRaises(ValidationError):
             self.task1.write({"dependency_task_ids": [(6, 0, [self.task3.id])]})
@@ -62,6 +88,9 @@ class TestProjectTaskDependency(TransactionCase):
         )
         task2 = new_project.tasks.filtered(lambda t: t.name == "2")
         self.assertEqual(task2.dependency_task_ids[0].name, "1")
+        task1 = new_project.tasks.filtered(lambda t: t.name == "1")
+        self.assertEqual(task2.dependency_task_ids, task1)
+        self.assertEqual(task2.recursive_depending_task_ids.mapped("name"), ["3"])
         task3 = new_project.tasks.filtered(lambda t: t.name == "3")
         self.assertEqual(task3.dependency_task_ids[0].name, "2")
         new_project = self.project2.copy(
@@ -70,12 +99,388 @@ class TestProjectTaskDependency(TransactionCase):
         task4 = new_project.tasks.filtered(lambda t: t.name == "4")
         self.assertEqual(task4.dependency_task_ids[0].id, self.task2.id)
 
-    def test_regression_copy(self):
-        old_count = self.env["project.task.copy.map"].search_count(
-            [("old_task_id", "=", self.task4.id)]
+    def test_copy_task(self):
+        task4 = self.task4.copy()
+        self.assertEqual(task4.dependency_task_ids, self.task2)
+        self.assertEqual(self.task2.depending_task_ids, self.task3 | self.task4 | task4)
+
+    def _create_task_tree(self, count):
+        """Create ``count`` tasks, each one depending on its parent in a
+        binary tree, the first one depending on nothing. Tasks but the first
+        one and dependencies are inserted in SQL.
+        """
+        root = self.env["project.task"].create(
+            {"name": "Tree 0", "project_id": self.project2.id}
+        )
+        self.env["base"].flush()
+        self.env.cr.execute(
+            """
+            INSERT INTO project_task (
+              name, project_id, company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'Tree ' || i, project_id, company_id, kanban_state, active,
+              create_uid, create_date, write_uid, write_date
+            FROM project_task, generate_series(1, %s) AS i
+            WHERE id = %s
+            ORDER BY i
+            RETURNING id
+            """,
+            (count - 1, root.id),
+        )
+        task_ids = root.ids + sorted(row[0] for row in self.env.cr.fetchall())
+        if count > 1:
+            self.env.cr.execute(
+                """
+                INSERT INTO project_task_dependency_task_rel
+                  (task_id, dependency_task_id)
+                SELECT task_id, dependency_task_id
+                FROM unnest(%s::int[], %s::int[]) AS x(task_id, dependency_task_id)
+                """,
+                (task_ids[1:], [task_ids[i // 2] for i in range(count - 1)]),
+            )
+        tasks = self.env["project.task"].browse(task_ids)
+        tasks.invalidate_cache()
+        return tasks
+
+    def _assert_depending_query_count(self, count):
+        tasks = self._create_task_tree(count)
+        Task = self.env["project.task"]
+        with self.assertQueryCount(2):
+            depending = Task._get_depending_tasks(tasks.ids)
+            closure = Task._get_dependency_closure(tasks.ids, depending=True)
+        self.assertEqual(
+            sum(len(task_ids) for task_ids in depending.values()), count - 1
+        )
+        self.assertEqual(set().union(*closure.values()), set(tasks[1:].ids))
+        if count > 1:
+            self.assertEqual(tasks[0].depending_task_ids, tasks[1:3])
+            self.assertEqual(tasks[0].recursive_depending_task_ids, tasks[1:])
+
+    def test_05_depending_query_count_1(self):
+        self._assert_depending_query_count(1)
+
+    def test_06_depending_query_count_100(self):
+        self._assert_depending_query_count(100)
+
+    def test_07_depending_query_count_10000(self):
+        self._assert_depending_query_count(10000)
+
+    def test_08_depending_cycle(self):
+        self.env.cr.execute(
+            """
+            INSERT INTO project_task_dependency_task_rel
+              (task_id, dependency_task_id)
+            VALUES (%s, %s)
+            """,
+            (self.task1.id, self.task3.id),
+        )
+        self.task1.invalidate_cache()
+        self.assertEqual(
+            self.task1.recursive_depending_task_ids,
+            self.task1 | self.task2 | self.task3 | self.task4,
+        )
+
+    def _get_closure_rows(self):
+        self.env.cr.execute(
+            """
+            SELECT task_id, dependency_task_id, depth
+            FROM project_task_dependency_closure
+            WHERE task_id IN %s
+            """,
+            (tuple((self.task1 | self.task2 | self.task3 | self.task4).ids),),
+        )
+        return set(self.env.cr.fetchall())
+
+    def _assert_search_closure(self):
+        Task = self.env["project.task"]
+        self.assertEqual(
+            Task.search([("recursive_dependency_task_ids", "in", self.task1.ids)]),
+            self.task2 | self.task3 | self.task4,
+        )
+        self.assertEqual(
+            Task.search([("recursive_depending_task_ids", "=", self.task3.id)]),
+            self.task1 | self.task2,
+        )
+        self.assertNotIn(
+            self.task3,
+            Task.search([("recursive_dependency_task_ids", "not in", self.task1.ids)]),
+        )
+        self.assertIn(
+            self.task1, Task.search([("recursive_dependency_task_ids", "=", False)])
+        )
+
+    def test_09_search_recursive(self):
+        self._assert_search_closure()
+
+    def test_10_closure_table(self):
+        self.env["res.config.settings"].create(
+            {"project_task_dependency_closure": True}
+        ).execute()
+        task1, task2, task3, task4 = self.task1, self.task2, self.task3, self.task4
+        self.assertEqual(
+            self._get_closure_rows(),
+            {
+                (task2.id, task1.id, 1),
+                (task3.id, task2.id, 1),
+                (task3.id, task1.id, 2),
+                (task4.id, task2.id, 1),
+                (task4.id, task1.id, 2),
+            },
+        )
+        self._assert_search_closure()
+
+        # Dependencies added to a task reach the tasks depending on it
+        task0 = self.env["project.task"].create({"name": "0"})
+        task1.write({"dependency_task_ids": [(4, task0.id)]})
+        self.assertIn((task4.id, task0.id, 3), self._get_closure_rows())
+
+        task5 = self.env["project.task"].create(
+            {"name": "5", "dependency_task_ids": [(6, 0, task1.ids)]}
+        )
+        task3.write({"dependency_task_ids": [(4, task1.id)]})
+        self.assertIn((task3.id, task1.id, 1), self._get_closure_rows())
+
+        task2.write({"dependency_task_ids": [(6, 0, task5.ids)]})
+        rows = self._get_closure_rows()
+        self.assertIn((task4.id, task5.id, 2), rows)
+        self.assertIn((task4.id, task1.id, 3), rows)
+
+        task5.unlink()
+        rows = self._get_closure_rows()
+        self.assertNotIn((task4.id, task1.id, 3), rows)
+        self.assertEqual(task4.recursive_dependency_task_ids, task2)
+
+    def test_11_cycle_path(self):
+        with self.assertRaises(ValidationError) as error:
+            self.task1.write({"dependency_task_ids": [(4, self.task3.id)]})
+        path = [self.task1, self.task3, self.task2, self.task1]
+        self.assertIn(
+            " -> ".join(task.display_name for task in path), error.exception.name
+        )
+        with self.assertRaises(ValidationError) as error:
+            self.task4.write({"dependency_task_ids": [(4, self.task4.id)]})
+        self.assertIn(
+            "{0} -> {0}".format(self.task4.display_name), error.exception.name
+        )
+
+    def test_12_no_cycle_check_on_kept_edges(self):
+        self.task4.write({"dependency_task_ids": [(4, self.task3.id)]})
+        self.assertEqual(self.task4.dependency_task_ids, self.task2 | self.task3)
+
+    def test_13_critical_path(self):
+        self.task1.planned_hours = 2
+        self.task2.planned_hours = 3
+        self.task3.planned_hours = 1
+        task5 = self.env["project.task"].create(
+            {
+                "name": "5",
+                "planned_hours": 1,
+                "dependency_task_ids": [(6, 0, self.task1.ids)],
+                "project_id": self.project1.id,
+            }
+        )
+        self.project1.action_compute_critical_path()
+        tasks = self.task1 | self.task2 | self.task3 | task5
+        self.assertEqual(tasks.mapped("earliest_start"), [0, 2, 5, 2])
+        self.assertEqual(tasks.mapped("latest_start"), [0, 2, 5, 5])
+        self.assertEqual(tasks.mapped("total_slack"), [0, 0, 0, 3])
+        self.assertEqual(tasks.filtered("is_critical"), tasks - task5)
+        # Dependencies on tasks of other projects are ignored
+        self.assertFalse(self.task4.is_critical)
+        self.env["project.project"]._cron_compute_critical_path()
+        self.assertEqual(self.task4.earliest_start, 0)
+        self.assertTrue(self.task4.is_critical)
+
+    def test_14_dependency_levels(self):
+        task5 = self.env["project.task"].create(
+            {"name": "5", "project_id": self.project1.id}
+        )
+        levels = self.env["project.task"].get_dependency_levels(
+            [("project_id", "=", self.project1.id)]
+        )
+        self.assertEqual(
+            levels,
+            [sorted([self.task1.id, task5.id]), [self.task2.id], [self.task3.id]],
+        )
+        # The dependency of task 4 is not part of the domain
+        levels = self.env["project.task"].get_dependency_levels(
+            [("id", "in", (self.task3 | self.task4).ids)]
+        )
+        self.assertEqual(levels, [sorted([self.task3.id, self.task4.id])])
+
+        controller = TaskDependencyController()
+        with mock.patch.object(http, "request") as request:
+            request.env = self.env
+            response = controller.dependency_levels(project_id=str(self.project1.id))
+            chunks = list(response.get_app_iter({"REQUEST_METHOD": "GET"}))
+            with self.assertRaises(werkzeug.exceptions.BadRequest):
+                controller.dependency_levels(project_id="1 OR 1=1")
+        self.assertEqual(
+            [json.loads(chunk) for chunk in chunks],
+            [
+                {"level": 0, "task_ids": sorted([self.task1.id, task5.id])},
+                {"level": 1, "task_ids": [self.task2.id]},
+                {"level": 2, "task_ids": [self.task3.id]},
+            ],
+        )
+        with mock.patch.object(main, "PAGE_SIZE", 1):
+            pages = list(controller._stream_levels([[1, 2, 3], [4]]))
+        self.assertEqual(
+            [json.loads(page)["task_ids"] for page in pages], [[1], [2], [3], [4]]
+        )
+
+    def test_15_blocked(self):
+        self.assertEqual(self.task2.open_dependency_count, 1)
+        self.assertTrue(self.task2.is_blocked)
+        self.assertFalse(self.task1.is_blocked)
+        self.assertTrue(self.task4.is_blocked)
+
+        done = self.env["project.task.type"].create({"name": "Done", "fold": True})
+        self.task1.stage_id = done
+        self.assertEqual(self.task2.open_dependency_count, 0)
+        self.assertFalse(self.task2.is_blocked)
+        done.fold = False
+        self.assertTrue(self.task2.is_blocked)
+
+        self.task4.write({"dependency_task_ids": [(4, self.task1.id)]})
+        self.assertEqual(self.task4.open_dependency_count, 2)
+        self.task2.active = False
+        self.assertEqual(self.task4.open_dependency_count, 1)
+        self.assertEqual(self.task3.open_dependency_count, 0)
+        self.task1.unlink()
+        self.assertEqual(self.task4.open_dependency_count, 0)
+        self.assertFalse(self.task4.is_blocked)
+        self.assertEqual(
+            self.env["project.task"].search(
+                [("is_blocked", "=", True), ("id", "in", self.task3.ids)]
+            ),
+            self.env["project.task"],
+        )
+
+    def test_16_depending_inverse(self):
+        Task = self.env["project.task"]
+        self.assertEqual(
+            Task.search([("depending_task_ids", "in", self.task3.ids)]), self.task2
+        )
+        self.assertEqual(self.task2.depending_task_ids, self.task3 | self.task4)
+
+        task5 = Task.create(
+            {
+                "name": "5",
+                "project_id": self.project1.id,
+                "depending_task_ids": [(6, 0, self.task1.ids)],
+            }
+        )
+        self.assertEqual(self.task1.dependency_task_ids, task5)
+        self.assertTrue(self.task1.is_blocked)
+        self.assertIn(task5, self.task3.recursive_dependency_task_ids)
+
+        task6 = Task.create({"name": "6", "project_id": self.project1.id})
+        task6.write({"depending_task_ids": [(4, self.task1.id)]})
+        self.assertEqual(self.task1.open_dependency_count, 2)
+        self.assertFalse(self.task2.copy().depending_task_ids)
+
+        with self.assertRaises(ValidationError):
+            self.task3.write({"depending_task_ids": [(4, self.task1.id)]})
+        with self.assertRaises(ValidationError):
+            Task.create(
+                {
+                    "name": "7",
+                    "dependency_task_ids": [(6, 0, self.task3.ids)],
+                    "depending_task_ids": [(6, 0, self.task2.ids)],
+                }
+            )
+
+    def test_17_export_graph(self):
+        controller = TaskDependencyController()
+        queries = controller._get_export_queries(
+            self.env, [("project_id", "=", self.project1.id)]
+        )
+        lines = list(controller._iter_export_lines(self.env.cr, queries, "ndjson"))
+        rows = [json.loads(line) for line in lines]
+        tasks = self.task1 | self.task2 | self.task3
+        self.assertEqual(
+            [row["id"] for row in rows if row["type"] == "task"], tasks.ids
+        )
+        # The dependency of task 4 on task 2 is out of the exported tasks
+        self.assertEqual(
+            sorted(
+                (row["task_id"], row["dependency_task_id"])
+                for row in rows
+                if row["type"] == "dependency"
+            ),
+            [(self.task2.id, self.task1.id), (self.task3.id, self.task2.id)],
+        )
+
+        dot = "".join(controller._iter_export_lines(self.env.cr, queries, "dot"))
+        self.assertTrue(dot.startswith("digraph dependencies {\n"))
+        self.assertIn("  {} -> {};\n".format(self.task1.id, self.task2.id), dot)
+
+    def test_18_update_dependencies(self):
+        Task = self.env["project.task"]
+        task5 = Task.create({"name": "5", "project_id": self.project1.id})
+        self.assertFalse(self.task1.is_blocked)
+        # One query per statement and per distinct new dependency
+        with self.assertQueryCount(10):
+            Task.update_dependencies(
+                to_add=[
+                    (self.task1.id, task5.id),
+                    (self.task4.id, self.task3.id),
+                    (self.task3.id, self.task2.id),
+                ],
+                to_remove=[(self.task4.id, self.task2.id)],
+            )
+        self.assertEqual(self.task1.dependency_task_ids, task5)
+        self.assertTrue(self.task1.is_blocked)
+        self.assertEqual(self.task4.dependency_task_ids, self.task3)
+        self.assertEqual(self.task2.depending_task_ids, self.task3)
+        self.assertEqual(
+            task5.recursive_depending_task_ids,
+            self.task1 | self.task2 | self.task3 | self.task4,
+        )
+        with self.assertRaises(ValidationError):
+            Task.update_dependencies(to_add=[(task5.id, self.task4.id)])
+
+    def test_19_export_graph_route(self):
+        # The export reads from its own cursor, use the test one instead
+        registry = mock.MagicMock()
+        registry.cursor.return_value.__enter__.return_value = self.env.cr
+        registry.cursor.return_value.__exit__.return_value = False
+        with mock.patch.object(http, "request") as request, mock.patch.object(
+            odoo, "registry", return_value=registry
+        ):
+            request.env = self.env
+            response = TaskDependencyController().export_graph(
+                project_id=str(self.project1.id), output="dot"
+            )
+            chunks = list(response.get_app_iter({"REQUEST_METHOD": "GET"}))
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        dot = b"".join(chunks).decode()
+        self.assertTrue(dot.startswith("digraph dependencies {\n"))
+        self.assertIn("  {} -> {};\n".format(self.task2.id, self.task3.id), dot)
+        self.assertTrue(dot.endswith("}\n"))
+
+    def test_20_critical_path_cycle(self):
+        self.task1.planned_hours = 2
+        task5 = self.env["project.task"].create(
+            {
+                "name": "5",
+                "dependency_task_ids": [(6, 0, self.task2.ids)],
+                "project_id": self.project1.id,
+            }
         )
-        self.task4.copy()
-        new_count = self.env["project.task.copy.map"].search_count(
-            [("old_task_id", "=", self.task4.id)]
+        self.env.cr.execute(
+            """
+            INSERT INTO project_task_dependency_task_rel
+              (task_id, dependency_task_id)
+            VALUES (%s, %s)
+            """,
+            (self.task2.id, task5.id),
         )
-        self.assertEqual(old_count, new_count)
+        self.task2.invalidate_cache()
+        self.project1.action_compute_critical_path()
+        # Tasks 2, 3 and 5 are on or after a cycle and not scheduled
+        self.assertTrue(self.task1.is_critical)
+        self.assertEqual(self.task1.latest_start, 0)
+        self.assertFalse(self.task2.is_critical)